@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Jan 31 09:12:44 2026
+
+@author: eloaeza
+
+Performance benchmark for the ingest and cost pipeline on synthetic
+HADR-shaped data (the real workbooks stay out of the repo).
+
+Generates one "Financial and Utilization Data" workbook per cycle with the
+4-row page / column / line header, the P0 identification lines, the
+P10/P12 measures on revenue-center lines and `--pcls` filler columns, then
+times each stage:
+
+    xlsx_parse:*   one pass over the sheets per available xlsx reader
+                   (calamine, xml, openpyxl), checked to give the same rows
+    ingest         step1.process_file per workbook with the first reader:
+                   parse, typed Arrow table, parquet write
+    append         step1.append_partitioned: hive-partitioned parquet
+                   written with pyarrow
+    select         DuckDB selection (exclusions, year window) -> Arrow
+    dedupe         case mix lookup + best report per hospital-year
+    melt_pivot     the old melt / pivot_table CCR path
+    ccr            revenue-center cube CCR and payer costs (numpy)
+    ccr_polars     the same as a lazy Polars plan
+    aggregation    revenue-center filter, facility totals, CCR summary
+    polars_backend selection through summary as one Polars plan
+
+reporting wall time (best of --repeat), peak RSS and rows/sec. Results can
+be saved as a JSON baseline and compared against later:
+
+    python scripts/bench_pipeline.py --hospitals 400 --cycles 3 --save-baseline bench.json
+    python scripts/bench_pipeline.py --hospitals 400 --cycles 3 --baseline bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import platform
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+
+import step1_append_single_sheet as step1
+from benchmark_engine import ccr_summary, compute_calc, drop_empty_revenue_centers, facility_totals, legacy_calc
+from benchmark_polars import compute_calc_polars
+from instrument import PeakRSS
+from pipeline_polars import assert_matches_pandas, run_polars
+from step_2_create_df import EXTRA_PCLS, PAIRS, dedupe, prepare, select_measures
+from xlsx_reader import READERS, available_readers, open_sheet
+
+
+SHEET = step1.SHEETS["fin_util"]
+FIRST_CYCLE = 41          # 41hospitaldata.xlsx ~ report periods ending 2017
+LINES = range(1, 420, 3)  # revenue-center lines per measure
+REGRESSION = 1.10         # flag stages more than 10% slower than the baseline
+
+
+# ---- synthetic data ---------------------------------------------------------
+
+def synthetic_pcls(n_filler: int, seed: int = 0) -> list[tuple]:
+    """(page, col, line) of every column after facility number / end date."""
+    rng = random.Random(seed)
+    pcls = [(0, 1, 2), (0, 1, 3), (0, 1, 36), (0, 1, 37)]
+    pcls += [(int(p), int(c), l) for p, c in PAIRS for l in LINES]
+    taken = set(pcls)
+    target = len(pcls) + n_filler
+    while len(pcls) < target:
+        pcl = (rng.choice([3, 4, 5, 6, 7, 8, 9, 11, 13, 14]), rng.randint(1, 30), rng.randint(1, 500))
+        if pcl not in taken:
+            taken.add(pcl)
+            pcls.append(pcl)
+    return pcls
+
+
+def synthetic_workbook(
+    path: Path,
+    cycle: int,
+    n_hospitals: int,
+    pcls: list[tuple],
+    seed: int = 0,
+) -> int:
+    """Write one HADR-like workbook; returns the number of data rows."""
+    rng = random.Random(seed * 1000 + cycle)
+    year = 2000 + cycle - 24
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(SHEET)
+    for k in range(3):
+        ws.append([None, None] + [pcl[k] for pcl in pcls])
+    ws.append(["FAC_NO", "REPORT_PERIOD_END"] + [f"P{p} C{c} L{l}" for p, c, l in pcls])
+
+    n_rows = 0
+    for h in range(n_hospitals):
+        # a few hospitals file two reports for the same year
+        for dup in range(2 if h % 17 == 0 else 1):
+            begin = dt.datetime(year - 1, 7, 1) + dt.timedelta(days=30 * dup)
+            end = dt.datetime(year, 6, 30)
+            row = [f"106{h:06d}", end]
+            # some names carry _xHHHH_ escapes, which every xlsx reader must decode alike
+            name = f"Hospital {h}" if h % 13 else f"Hospital {h}_x000D_ _x005F_x000D_"
+            for p, c, l in pcls:
+                if (p, c) == (0, 1):
+                    row.append({2: name, 3: f"HOSP{h:05d}", 36: begin, 37: end}[l])
+                elif rng.random() < 0.3:
+                    row.append(None)
+                else:
+                    row.append(round(rng.uniform(0, 5e6), 2))
+            ws.append(row)
+            n_rows += 1
+    wb.save(path)
+    return n_rows
+
+
+def synthetic_case_mix(n_hospitals: int, years: range) -> pd.DataFrame:
+    rng = random.Random(1)
+    rows = [
+        {
+            "county": "X", "oshpd_id": f"{h:06d}", "hospital": f"Hospital {h}",
+            "case_mix_index": rng.uniform(0.8, 2.5), "period_type": "FY",
+            "period_year": y, "facility_key": h,
+        }
+        for h in range(n_hospitals) for y in years
+    ]
+    return pd.DataFrame(rows).astype({"oshpd_id": "string", "facility_key": "Int32", "period_year": "int16"})
+
+
+# ---- measurement ------------------------------------------------------------
+
+def measure(fn, rows: int, repeat: int = 1) -> tuple[dict, object]:
+    """Best wall time over `repeat` runs, peak RSS, rows/sec; and fn's result."""
+    best = float("inf")
+    peak = 0
+    result = None
+    for _ in range(repeat):
+        with PeakRSS() as mem:
+            t0 = time.perf_counter()
+            result = fn()
+            secs = time.perf_counter() - t0
+        best = min(best, secs)
+        peak = max(peak, mem.peak)
+    return {
+        "secs": round(best, 4),
+        "peak_rss_mb": round(peak / 1024**2, 1),
+        "rows": rows,
+        "rows_per_sec": round(rows / best, 1) if best > 0 else None,
+    }, result
+
+
+# ---- stages -----------------------------------------------------------------
+
+def parse_workbook(path: Path, reader: str = "auto") -> tuple[pd.DataFrame, list[tuple]]:
+    with open_sheet(path, SHEET, reader) as (_, rows):
+        header4 = pd.DataFrame([next(rows, ()) for _ in range(4)], dtype=object)
+        return header4, [r for r in rows if r]
+
+
+def same_parse(a: list[tuple], b: list[tuple]) -> bool:
+    # values and their types (1 and 1.0 compare equal)
+    return all(
+        ha.equals(hb) and ra == rb
+        and all(type(x) is type(y) for r1, r2 in zip(ra, rb) for x, y in zip(r1, r2))
+        for (ha, ra), (hb, rb) in zip(a, b)
+    )
+
+
+def run_benchmark(
+    work_dir: Path,
+    n_hospitals: int = 400,
+    n_cycles: int = 3,
+    n_filler: int = 2000,
+    repeat: int = 1,
+    seed: int = 0,
+    readers: list[str] | None = None,
+) -> dict:
+    raw = work_dir / "raw"
+    out = work_dir / "out"
+    for d in (raw, out):
+        shutil.rmtree(d, ignore_errors=True)
+        d.mkdir(parents=True)
+
+    pcls = synthetic_pcls(n_filler, seed)
+    xlsx = []
+    n_rows = 0
+    t0 = time.perf_counter()
+    for dc in range(FIRST_CYCLE, FIRST_CYCLE + n_cycles):
+        path = raw / f"{dc}hospitaldata.xlsx"
+        n_rows += synthetic_workbook(path, dc, n_hospitals, pcls, seed)
+        xlsx.append(path)
+    print(f"generated {n_cycles} workbooks, {n_rows} rows x {len(pcls) + 2} columns "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+    years = (2000 + FIRST_CYCLE - 24, 2000 + FIRST_CYCLE - 24 + n_cycles - 1)
+    no_exclusions = pd.DataFrame({"OSHPD_FACILITY_NUMBER": pd.Series([], dtype="string")})
+    case_mix = synthetic_case_mix(n_hospitals, range(years[0], years[1] + 1))
+    stages: dict[str, dict] = {}
+
+    def timed(name, fn, rows):
+        stats, result = measure(fn, rows, repeat)
+        stages[name] = stats
+        print(f"{name:20s} {stats['secs']:9.3f}s {stats['peak_rss_mb']:9.1f} MB "
+              f"{stats['rows_per_sec'] or 0:14,.0f} rows/s")
+        return result
+
+    readers = readers or available_readers()
+    parses = {}
+    for reader in readers:
+        parses[reader] = timed(
+            f"xlsx_parse:{reader}", lambda: [parse_workbook(p, reader) for p in xlsx], n_rows
+        )
+        if not same_parse(parses[reader], parses[readers[0]]):
+            raise ValueError(f"the {reader} and {readers[0]} xlsx readers disagree")
+    del parses
+    timed(
+        "ingest",
+        lambda: [step1.process_file(p, SHEET, out, "fin_util", reader=readers[0]) for p in xlsx],
+        n_rows,
+    )
+    appended = timed("append", lambda: step1.append_partitioned(out, "fin_util"), n_rows)
+
+    selected = timed(
+        "select",
+        lambda: select_measures(appended, PAIRS, EXTRA_PCLS, no_exclusions, years).to_pandas(),
+        n_rows,
+    )
+    deduped = timed("dedupe", lambda: dedupe(prepare(selected, case_mix)), len(selected))
+
+    id_vars = [c for c in deduped.columns if not c.startswith("P") or c == "P0_C1_L3"]
+    timed("melt_pivot", lambda: legacy_calc(deduped, id_vars), len(deduped))
+    calc = timed("ccr", lambda: compute_calc(deduped), len(deduped))
+    timed("ccr_polars", lambda: compute_calc_polars(deduped), len(deduped))
+
+    def aggregate():
+        kept = drop_empty_revenue_centers(calc)
+        return facility_totals(kept), ccr_summary(kept)
+
+    totals, summary = timed("aggregation", aggregate, len(calc))
+    fused = timed(
+        "polars_backend",
+        lambda: run_polars(appended, PAIRS, EXTRA_PCLS, no_exclusions, case_mix, years),
+        n_rows,
+    )
+    assert_matches_pandas(fused, {"totals": totals, "summary": summary})
+
+    return {
+        "meta": {
+            "hospitals": n_hospitals,
+            "cycles": n_cycles,
+            "filler_pcls": n_filler,
+            "columns": len(pcls) + 2,
+            "rows": n_rows,
+            "repeat": repeat,
+            "seed": seed,
+            "readers": readers,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": dt.datetime.now().isoformat(timespec="seconds"),
+        },
+        "stages": stages,
+    }
+
+
+def compare(result: dict, baseline: dict, threshold: float = REGRESSION) -> list[str]:
+    """Print time ratios against a baseline; returns the regressed stages."""
+    if result["meta"]["rows"] != baseline["meta"]["rows"]:
+        print("note: baseline was run on a different data size "
+              f"({baseline['meta']['rows']} vs {result['meta']['rows']} rows)")
+    regressed = []
+    print(f"\n{'stage':20s} {'baseline':>10s} {'now':>10s} {'ratio':>7s}")
+    for name, now in result["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            print(f"{name:20s} {'-':>10s} {now['secs']:10.3f}")
+            continue
+        ratio = now["secs"] / base["secs"] if base["secs"] else float("inf")
+        flag = "  SLOWER" if ratio > threshold else ("  faster" if ratio < 1 / threshold else "")
+        print(f"{name:20s} {base['secs']:10.3f} {now['secs']:10.3f} {ratio:7.2f}{flag}")
+        if ratio > threshold:
+            regressed.append(name)
+    return regressed
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Benchmark the ingest and cost pipeline on synthetic data.")
+    ap.add_argument("--hospitals", type=int, default=400)
+    ap.add_argument("--cycles", type=int, default=3)
+    ap.add_argument("--pcls", type=int, default=2000, help="filler PCL columns besides the benchmark measures")
+    ap.add_argument("--repeat", type=int, default=1, help="runs per stage; the best time is kept")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--readers", nargs="+", choices=READERS,
+                    help="xlsx readers to time (default: every installed one)")
+    ap.add_argument("--work-dir", type=Path, help="where the synthetic data goes (default: a temp dir)")
+    ap.add_argument("--save-baseline", type=Path, help="write the results to this JSON file")
+    ap.add_argument("--baseline", type=Path, help="compare against a saved JSON baseline")
+    ap.add_argument("--threshold", type=float, default=REGRESSION,
+                    help="time ratio above which a stage counts as a regression")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix="hadr_bench_"))
+    try:
+        result = run_benchmark(
+            work_dir, args.hospitals, args.cycles, args.pcls, args.repeat, args.seed, args.readers
+        )
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(result, indent=2))
+        print("wrote:", args.save_baseline)
+
+    if args.baseline:
+        regressed = compare(result, json.loads(args.baseline.read_text()), args.threshold)
+        if regressed and args.fail_on_regression:
+            raise SystemExit(f"slower than baseline: {', '.join(regressed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Jan 25 09:18:47 2026
+
+@author: eloaeza
+
+Cost-to-charge ratio and payer cost per revenue center, computed directly
+on the deduplicated wide frame.
+
+Instead of melting every P{p}_C{c}_L{l} column to long, regex-extracting
+px_cx / revenue_center and pivoting back, each Px_Cx measure is gathered
+into a (facility-year x revenue-center) array aligned on the union of line
+numbers; the CCR and payer costs are then plain array arithmetic.
+
+legacy_calc() keeps the melt/pivot_table path from step_2_create_df.py so
+the two can be checked against each other with assert_matches_legacy().
+"""
+
+from __future__ import annotations
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+KEYS = ["OSHPD_FACILITY_NUMBER", "P0_C1_L3", "YEAR_END"]
+
+# numerator / denominator of the cost-to-charge ratio (P10 = Summary of
+# Revenue and Costs)
+CCR_COST = ["P10_C9", "P10_C13"]   # net costs as reallocated + professional component adj.
+CCR_CHARGE = "P10_C11"             # gross revenue
+
+# gross inpatient + outpatient revenue, traditional + managed care (P12)
+PAYER_REVENUE = {
+    "medicare_cost_rc": ["P12_C1", "P12_C2", "P12_C3", "P12_C4"],
+    "private_cost_rc": ["P12_C13", "P12_C14", "P12_C15", "P12_C16"],
+}
+
+MEASURES = sorted({*CCR_COST, CCR_CHARGE, *(c for cs in PAYER_REVENUE.values() for c in cs)})
+
+_PCL_RE = re.compile(r"^(P\d+_C\d+)_L(\d+)$")
+
+
+def measure_columns(columns, measures: list[str]) -> dict[str, dict[int, str]]:
+    """{Px_Cx: {line: column name}} for the wide columns of each measure."""
+    wanted = set(measures)
+    out: dict[str, dict[int, str]] = {m: {} for m in measures}
+    for c in columns:
+        m = _PCL_RE.match(str(c))
+        if m and m.group(1) in wanted:
+            out[m.group(1)][int(m.group(2))] = c
+    return out
+
+
+def revenue_center_cube(
+    df: pd.DataFrame,
+    measures: list[str] = MEASURES,
+    keys: list[str] = KEYS,
+) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """
+    Align the wide measure columns on a common revenue-center axis.
+
+    Returns (key frame, lines, cube) where cube[k, i, j] is measure k for
+    facility-year i at revenue center lines[j] (NaN when not reported).
+    Rows are grouped and sorted by `keys` the same way pivot_table does:
+    rows with a missing key are dropped, duplicates take the first
+    non-null value per column.
+    """
+    cols = measure_columns(df.columns, measures)
+    needed = [c for m in measures for c in cols[m].values()]
+
+    wide = df[keys + needed]
+    # typed ingest already gives numeric columns; text-era parquet needs
+    # parsing, and anything else (e.g. a date-typed PCL) is not a measure
+    fixes = {}
+    for c in needed:
+        dtype = wide[c].dtype
+        if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+            if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+                fixes[c] = pd.to_numeric(wide[c], errors="coerce")
+            else:
+                fixes[c] = np.nan
+    if fixes:
+        wide = pd.concat(
+            [wide.drop(columns=list(fixes)), pd.DataFrame(fixes, index=wide.index)], axis=1
+        )
+    wide = wide.groupby(keys, sort=True).first().reset_index()
+
+    lines = np.array(sorted({l for m in measures for l in cols[m]}), dtype=np.int64)
+    pos = {l: j for j, l in enumerate(lines)}
+
+    cube = np.full((len(measures), len(wide), len(lines)), np.nan)
+    for k, m in enumerate(measures):
+        if cols[m]:
+            idx = [pos[l] for l in cols[m]]
+            cube[k][:, idx] = wide[list(cols[m].values())].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    return wide[keys], lines, cube
+
+
+def ccr_and_costs(cube: np.ndarray, measures: list[str] = MEASURES) -> dict[str, np.ndarray]:
+    """Cost-to-charge ratio and payer costs on the aligned arrays."""
+    k = {m: i for i, m in enumerate(measures)}
+    z = np.nan_to_num
+
+    charge = cube[k[CCR_CHARGE]]
+    cost = sum(z(cube[k[m]]) for m in CCR_COST)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ccr = np.where(np.isnan(charge) | (charge == 0), np.nan, cost / charge)
+
+    out = {"cost_to_charge_ratio": ccr}
+    for name, revenue in PAYER_REVENUE.items():
+        out[name] = sum(z(cube[k[m]]) for m in revenue) * ccr
+    return out
+
+
+def compute_calc(
+    df: pd.DataFrame,
+    measures: list[str] = MEASURES,
+    keys: list[str] = KEYS,
+) -> pd.DataFrame:
+    """
+    One row per facility-year x revenue center with at least one reported
+    measure: keys, revenue_center, the Px_Cx measures, cost_to_charge_ratio,
+    medicare_cost_rc and private_cost_rc.
+    """
+    key_frame, lines, cube = revenue_center_cube(df, measures, keys)
+    derived = ccr_and_costs(cube, measures)
+
+    n_rows, n_lines = cube.shape[1], cube.shape[2]
+    keep = (~np.isnan(cube)).any(axis=0).ravel()
+    row_idx = np.repeat(np.arange(n_rows), n_lines)[keep]
+
+    calc = key_frame.iloc[row_idx].reset_index(drop=True)
+    calc["revenue_center"] = pd.array(np.tile(lines, n_rows)[keep], dtype="Int64")
+    for i, m in enumerate(measures):
+        calc[m] = cube[i].ravel()[keep]
+    for name, values in derived.items():
+        calc[name] = values.ravel()[keep]
+    calc.columns.name = None
+    return calc
+
+
+def legacy_calc(df: pd.DataFrame, id_vars: list[str]) -> pd.DataFrame:
+    """The melt -> str.extract -> pivot_table path from step_2_create_df.py."""
+    value_vars = [c for c in df.columns if c.startswith("P")]
+    long = df.melt(id_vars=id_vars, value_vars=value_vars, var_name="pcl", value_name="value")
+    long["px_cx"] = long["pcl"].str.extract(r"^(P\d+_C\d+)")
+    long["revenue_center"] = long["pcl"].str.extract(r"_L(\d+)").astype("Int64")
+    long["value"] = pd.to_numeric(long["value"], errors="coerce")
+
+    calc = (
+        long
+        .pivot_table(
+            index=KEYS + ["revenue_center"],
+            columns="px_cx",
+            values="value",
+            aggfunc="first",
+        )
+        .reset_index()
+    )
+
+    calc["cost_to_charge_ratio"] = (
+        (calc["P10_C9"].fillna(0) + calc["P10_C13"].fillna(0))
+        .div(calc["P10_C11"])
+    )
+    calc.loc[calc["P10_C11"].isna() | (calc["P10_C11"] == 0), "cost_to_charge_ratio"] = pd.NA
+
+    for name, revenue in PAYER_REVENUE.items():
+        calc[name] = sum(calc[m].fillna(0) for m in revenue) * calc["cost_to_charge_ratio"]
+    return calc
+
+
+def assert_matches_legacy(df: pd.DataFrame, id_vars: list[str], rtol: float = 0.0) -> None:
+    """
+    Regression check: compute_calc(df) must equal legacy_calc(df) on every
+    benchmark column. The legacy pivot also melts P0_C1_L3 (it starts with
+    "P") into a stray P0_C1 column and rows for line 3; those are dropped
+    before comparing.
+    """
+    new = compute_calc(df)
+    old = legacy_calc(df, id_vars)
+
+    old = old.dropna(subset=[m for m in MEASURES if m in old.columns], how="all")
+    cols = list(new.columns)
+    old = old.reindex(columns=cols).reset_index(drop=True)
+    old.columns.name = None
+
+    pd.testing.assert_frame_equal(
+        new, old, check_dtype=False, check_exact=rtol == 0.0, rtol=rtol or 1e-5
+    )
+
+
+# ---- aggregation layer ------------------------------------------------------
+# All of these stay in pandas' cython groupby kernels; no per-group lambdas.
+
+def drop_empty_revenue_centers(
+    calc: pd.DataFrame,
+    max_revenue_center: int | None = 416,
+) -> pd.DataFrame:
+    """
+    Keep revenue-center lines below `max_revenue_center` (higher lines are
+    not revenue centers) that have a cost-to-charge ratio for at least one
+    facility-year.
+    """
+    if max_revenue_center is not None:
+        calc = calc[calc["revenue_center"] < max_revenue_center]
+    has_ccr = (
+        calc["cost_to_charge_ratio"].notna()
+        .groupby(calc["revenue_center"]).transform("any")
+    )
+    return calc[has_ccr.to_numpy(dtype=bool)]
+
+
+def facility_totals(
+    calc: pd.DataFrame,
+    keys: list[str] = KEYS,
+    costs: dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """
+    Total payer cost per facility-year, summed across revenue centers.
+    A facility-year with no cost at all stays NaN rather than 0.
+    """
+    costs = costs or {"medicare_cost_rc": "tot_medicare", "private_cost_rc": "tot_private"}
+    return (
+        calc.groupby(keys, as_index=False)[list(costs)]
+        .sum(min_count=1)
+        .rename(columns=costs)
+    )
+
+
+def ccr_summary(calc: pd.DataFrame, value: str = "cost_to_charge_ratio") -> pd.DataFrame:
+    """Distribution of `value` per revenue center (mean, median, min, max, p25, p75, n)."""
+    g = calc.groupby("revenue_center")[value]
+    out = g.agg(["mean", "median", "min", "max"])
+    q = g.quantile([0.25, 0.75]).unstack()
+    out["p25"] = q[0.25]
+    out["p75"] = q[0.75]
+    out["n"] = g.count()
+    return out.reset_index()
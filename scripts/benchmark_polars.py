@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jan 29 16:03:27 2026
+
+@author: eloaeza
+
+Polars version of benchmark_engine.compute_calc().
+
+The deduplicated wide frame is handed over as Arrow (no copy), the
+Px_Cx_Ly measure columns are unpivoted lazily, and the cost-to-charge
+ratio and payer costs are Polars expressions, so the whole thing is one
+lazy plan that Polars runs multi-threaded. The result comes back as an
+Arrow table with the same rows, columns and values as compute_calc().
+"""
+
+from __future__ import annotations
+
+from functools import reduce
+from operator import add
+
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+
+from benchmark_engine import CCR_CHARGE, CCR_COST, KEYS, MEASURES, PAYER_REVENUE, measure_columns
+
+
+def to_polars(df: pd.DataFrame | pa.Table) -> pl.DataFrame:
+    if isinstance(df, pa.Table):
+        return pl.from_arrow(df)
+    return pl.from_pandas(df)
+
+
+def numeric_measure(name: str, dtype: pl.DataType) -> pl.Expr:
+    # same rules as revenue_center_cube: numbers as is, text parsed, anything
+    # else (e.g. a date-typed PCL) is not a measure
+    col = pl.col(name)
+    if dtype.is_numeric() and dtype != pl.Boolean:
+        return col.cast(pl.Float64)
+    if dtype in (pl.String, pl.Categorical):
+        return col.cast(pl.String).str.strip_chars().cast(pl.Float64, strict=False)
+    return pl.lit(None, dtype=pl.Float64).alias(name)
+
+
+def filled_sum(columns: list[str]) -> pl.Expr:
+    # left to right like the numpy path, so the floats match to the last bit
+    return reduce(add, (pl.col(m).fill_null(0) for m in columns))
+
+
+def ccr_expressions() -> list[pl.Expr]:
+    charge = pl.col(CCR_CHARGE)
+    cost = filled_sum(CCR_COST)
+    ccr = (
+        pl.when(charge.is_null() | (charge == 0))
+        .then(None)
+        .otherwise(cost / charge)
+        .alias("cost_to_charge_ratio")
+    )
+    return [ccr]
+
+
+def cost_expressions() -> list[pl.Expr]:
+    return [
+        (filled_sum(revenue) * pl.col("cost_to_charge_ratio"))
+        .alias(name)
+        for name, revenue in PAYER_REVENUE.items()
+    ]
+
+
+def calc_plan(
+    wide: pl.LazyFrame,
+    schema: pl.Schema,
+    measures: list[str] = MEASURES,
+    keys: list[str] = KEYS,
+) -> pl.LazyFrame:
+    """Lazy compute_calc() over a wide LazyFrame with the given schema."""
+    cols = measure_columns(schema.names(), measures)
+    needed = [c for m in measures for c in cols[m].values()]
+    column_of = {c: (m, line) for m in measures for line, c in cols[m].items()}
+
+    long = (
+        wide
+        .select([pl.col(k) for k in keys] + [numeric_measure(c, schema[c]) for c in needed])
+        .drop_nulls(keys)
+        .unpivot(index=keys, on=needed, variable_name="pcl", value_name="value")
+        # NaN counts as not reported, like in the numpy cube
+        .with_columns(pl.col("value").fill_nan(None))
+        .drop_nulls("value")
+        .with_columns(
+            pl.col("pcl").replace_strict({c: m for c, (m, _) in column_of.items()}).alias("px_cx"),
+            pl.col("pcl").replace_strict(
+                {c: line for c, (_, line) in column_of.items()}, return_dtype=pl.Int64
+            ).alias("revenue_center"),
+        )
+    )
+
+    # one column per measure; duplicates take the first non-null value
+    calc = long.group_by(keys + ["revenue_center"], maintain_order=True).agg(
+        pl.col("value").filter(pl.col("px_cx") == m).first().alias(m) for m in measures
+    )
+    return (
+        calc
+        .with_columns(ccr_expressions())
+        .with_columns(cost_expressions())
+        .sort(keys + ["revenue_center"], maintain_order=True)
+        .select(keys + ["revenue_center", *measures, "cost_to_charge_ratio", *PAYER_REVENUE])
+    )
+
+
+def compute_calc_polars(
+    df: pd.DataFrame | pa.Table,
+    measures: list[str] = MEASURES,
+    keys: list[str] = KEYS,
+) -> pa.Table:
+    wide = to_polars(df)
+    return calc_plan(wide.lazy(), wide.schema, measures, keys).collect().to_arrow()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Jan 28 08:51:19 2026
+
+@author: eloaeza
+
+Pick one report per hospital-year: the one covering the longest period,
+then the one ending last.
+
+Same result as sorting by (group, DAY_PER desc, END_DATE desc) and
+keeping the first row per group, but computed with groupby max transforms
+on the narrow key columns only, so the wide frame is gathered once instead
+of being sorted. Missing period lengths / end dates lose to reported ones,
+and remaining ties go to the earliest row, as with the stable sort.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+GROUP = ["P0_C1_L3", "YEAR_END"]   # hospital name, year of the period end date
+BEGIN = "P0_C1_L36"                # reporting period begin date
+END = "P0_C1_L37"                  # reporting period end date
+
+
+def _best(values: pd.Series, by: list[pd.Series], candidates: np.ndarray) -> np.ndarray:
+    # among candidates, keep those equal to the group max (or all of them
+    # when nobody in the group has a value)
+    v = values.where(candidates)
+    top = v.groupby(by, dropna=False).transform("max")
+    return candidates & ((v == top).to_numpy(dtype=bool) | top.isna().to_numpy())
+
+
+def best_report_mask(
+    df: pd.DataFrame,
+    group: list[str] = GROUP,
+    begin: pd.Series | None = None,
+    end: pd.Series | None = None,
+) -> np.ndarray:
+    """
+    Boolean mask with one True per `group` value. `begin` / `end` are the
+    parsed period dates; by default BEGIN / END are parsed from df.
+    """
+    if begin is None:
+        begin = pd.to_datetime(df[BEGIN], errors="coerce")
+    if end is None:
+        end = pd.to_datetime(df[END], errors="coerce")
+    by = [df[g].reset_index(drop=True) for g in group]
+    begin = begin.reset_index(drop=True)
+    end = end.reset_index(drop=True)
+
+    day_per = (end - begin).dt.days
+    keep = np.ones(len(df), dtype=bool)
+    keep = _best(day_per, by, keep)
+    keep = _best(end, by, keep)
+
+    # first remaining row per group
+    first = pd.Series(keep).groupby(by, dropna=False).cumsum().to_numpy() == 1
+    return keep & first
+
+
+def best_reports(df: pd.DataFrame, group: list[str] = GROUP, **dates) -> pd.DataFrame:
+    """Rows of df picked by best_report_mask(), ordered by `group`."""
+    winners = df[best_report_mask(df, group, **dates)]
+    return winners.sort_values(group, kind="stable")
@@ -4,48 +4,141 @@
 Created on Sun Jan 18 12:14:43 2026
 
 @author: eloaeza
+
+Case mix index by hospital and year.
+
+The workbook is melted once and persisted as typed parquet (oshpd_id as
+text, plus an integer facility_key), and CaseMixIndex turns it into a
+dense (facility, year) grid so attaching the CMI to facility-years is an
+array gather instead of a merge.
 """
+from __future__ import annotations
+
+import numpy as np
 import pandas as pd
 import re
 from pathlib import Path
 
-# read the file
-df = pd.read_excel(
+CASE_MIX_XLSX = Path(
     "/Users/eloaeza/projects/hadr-project/data_raw/case-mix-index-d6t7du37/case-mix-index-1996-2024.xlsx"
 )
+OUT_CSV = Path("/Users/eloaeza/projects/hadr-project/outputs/case_mix_data.csv")
+OUT_PARQUET = Path("/Users/eloaeza/projects/hadr-project/outputs/case_mix_data.parquet")
 
 ID_COLS = ["county", "oshpd_id", "hospital"]
 
-# identify value columns (FYxxxx or CYxxxx)
-value_cols = [c for c in df.columns if re.match(r"^(FY|CY)\d{4}$", str(c))]
 
-# reshape to long
-df_long = df.melt(
-    id_vars=ID_COLS,
-    value_vars=value_cols,
-    var_name="period",
-    value_name="case_mix_index",
-)
+def load_case_mix(xlsx: Path = CASE_MIX_XLSX, min_year: int = 2015) -> pd.DataFrame:
+    """
+    Case mix index by hospital and year, long: county, oshpd_id, hospital,
+    case_mix_index, period_type (FY/CY), period_year.
+    """
+    # read the file (oshpd_id as text keeps the leading zeros)
+    df = pd.read_excel(xlsx, dtype={"oshpd_id": "string"})
+
+    # identify value columns (FYxxxx or CYxxxx)
+    value_cols = [c for c in df.columns if re.match(r"^(FY|CY)\d{4}$", str(c))]
+
+    # reshape to long
+    df_long = df.melt(
+        id_vars=ID_COLS,
+        value_vars=value_cols,
+        var_name="period",
+        value_name="case_mix_index",
+    )
+
+    # extract type (FY / CY) and numeric year
+    df_long["period_type"] = df_long["period"].str[:2]   # FY or CY
+    df_long["period_year"] = df_long["period"].str[2:].astype(int)
+
+    # drop original period string
+    df_long = df_long.drop(columns="period")
+
+    df_long = df_long[df_long["period_year"] >= min_year]
+
+    # integer key for the lookup grid; oshpd_id stays the text form
+    df_long["facility_key"] = pd.to_numeric(df_long["oshpd_id"], errors="coerce").astype("Int32")
+    df_long["period_year"] = df_long["period_year"].astype("int16")
+    return df_long.reset_index(drop=True)
+
+
+def case_mix_store(
+    xlsx: Path = CASE_MIX_XLSX,
+    parquet: Path = OUT_PARQUET,
+    min_year: int = 2015,
+) -> pd.DataFrame:
+    """
+    load_case_mix() through a parquet copy of all years, rebuilt when the
+    workbook is newer than it.
+    """
+    parquet = Path(parquet)
+    if parquet.exists() and parquet.stat().st_mtime >= Path(xlsx).stat().st_mtime:
+        df = pd.read_parquet(parquet)
+    else:
+        df = load_case_mix(xlsx, min_year=0)
+        parquet.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(parquet, index=False)
+    return df[df["period_year"] >= min_year].reset_index(drop=True)
+
+
+class CaseMixIndex:
+    """
+    Dense grid of case_mix_index by (facility_key, period_year).
+
+    facility_key -> row through a direct-address array, year -> column by
+    offset, so lookup() of a batch is two gathers. When a facility-year
+    appears more than once (e.g. FY and CY columns for the same year), the
+    first one in the workbook's column order wins. This is a change from
+    the original left merge, which repeated the report row once per
+    matching case mix row and left the hospital-year dedupe to pick one of
+    them (and so one of the CMI values) by sort position.
+    """
+
+    def __init__(self, case_mix: pd.DataFrame):
+        cm = case_mix.dropna(subset=["facility_key"])
+        cm = cm.drop_duplicates(["facility_key", "period_year"], keep="first")
+        keys = cm["facility_key"].to_numpy(dtype=np.int64)
+        years = cm["period_year"].to_numpy(dtype=np.int64)
+
+        facilities = np.unique(keys)
+        self.row_of = np.full(int(facilities.max()) + 1 if len(facilities) else 0, -1, dtype=np.int32)
+        self.row_of[facilities] = np.arange(len(facilities), dtype=np.int32)
+
+        self.first_year = int(years.min()) if len(years) else 0
+        n_years = int(years.max()) - self.first_year + 1 if len(years) else 0
+        self.grid = np.full((len(facilities), n_years), np.nan)
+        self.grid[self.row_of[keys], years - self.first_year] = cm["case_mix_index"].to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+
+    def lookup(self, facility_keys, years) -> np.ndarray:
+        """case_mix_index for each (facility_key, year); NaN where unknown."""
+        fk = pd.to_numeric(pd.Series(facility_keys), errors="coerce").to_numpy(dtype=np.float64)
+        yr = pd.to_numeric(pd.Series(years), errors="coerce").to_numpy(dtype=np.float64)
+        out = np.full(len(fk), np.nan)
+
+        ok = ~np.isnan(fk) & ~np.isnan(yr)
+        ok[ok] = (fk[ok] >= 0) & (fk[ok] < len(self.row_of))
+        row = np.full(len(fk), -1, dtype=np.int64)
+        row[ok] = self.row_of[fk[ok].astype(np.int64)]
+        col = np.where(ok, yr, self.first_year).astype(np.int64) - self.first_year
+        ok &= (row >= 0) & (col >= 0) & (col < self.grid.shape[1])
 
-# extract type (FY / CY) and numeric year
-df_long["period_type"] = df_long["period"].str[:2]   # FY or CY
-df_long["period_year"] = df_long["period"].str[2:].astype(int)
+        out[ok] = self.grid[row[ok], col[ok]]
+        return out
 
-# optional: drop original period string
-df_long = df_long.drop(columns="period")
 
-df_long.head()
+def main():
+    df_long = case_mix_store(CASE_MIX_XLSX, OUT_PARQUET)
 
-# Sanity checks
-df_long.head()
-df_long["period_type"].value_counts()
-(df_long["period_year"].min(), df_long["period_year"].max())
+    # Sanity checks
+    print(df_long["period_type"].value_counts())
+    print((df_long["period_year"].min(), df_long["period_year"].max()))
 
-df_long = df_long[df_long["period_year"] > 2014]
-df_long = df_long.reset_index(drop=True)
+    # the parquet store is what the pipeline reads; the CSV is for browsing
+    df_long.drop(columns="facility_key").to_csv(OUT_CSV, index=False)
+    print("wrote:", OUT_PARQUET, OUT_CSV)
 
 
-out = Path("/Users/eloaeza/projects/hadr-project/outputs/case_mix_data.csv")
-out.parent.mkdir(parents=True, exist_ok=True)
-df_long.to_csv(out, index=False)
-print("wrote:", out)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Feb  5 08:46:12 2026
+
+@author: eloaeza
+
+Persistent DuckDB catalog over the appended HADR parquet, built at ingest
+(step1_append_single_sheet.py --catalog) next to the outputs, for the
+Financial and Utilization sheet (fin_util):
+
+    <out_dir>/hadr_catalog.duckdb
+
+    catalog_meta               what each prefix was built from (appended
+                               file fingerprint, PCL pairs, version)
+    files                      registered per-cycle partitions: rows,
+                               columns, size, mtime
+    pcl_columns                every column of the appended dataset, with
+                               page / col / line for the PCL columns
+    {prefix}_wide              view over the appended parquet
+    {prefix}_measures          the benchmark measures (PAIRS + EXTRA_PCLS),
+                               materialized with hospital_type, oshpd_id,
+                               BEGIN_DATE, END_DATE and YEAR_END, all cycles,
+                               before exclusions and the year window
+    {prefix}_facility_year     view: one report per hospital-year (longest
+                               period, then latest end date)
+
+select_measures() in step_2_create_df.py reads {prefix}_measures instead of
+scanning the parquet when the catalog is current, i.e. built from the same
+appended files and covering the requested PCL pairs; otherwise it scans
+as before. Ad hoc:
+
+    duckdb -readonly outputs/out_step1_single_sheet/hadr_catalog.duckdb
+"""
+from __future__ import annotations
+
+import datetime as dt
+import json
+import re
+from pathlib import Path
+
+import duckdb
+import pyarrow.parquet as pq
+
+from pcl_store import parse_pcl
+from stage_cache import file_fingerprint
+
+
+CATALOG_NAME = "hadr_catalog.duckdb"
+
+# bump when the catalog layout changes so old catalogs are rebuilt
+# (2: row_id follows ROW_ORDER)
+CATALOG_VERSION = 2
+
+# columns of select_measures() around the selected PCLs
+LEADING = ["DISCLOSURE_CYCLE", "OSHPD_FACILITY_NUMBER", "REPORT_PERIOD_END_DATE"]
+DERIVED = ["hospital_type", "oshpd_id", "BEGIN_DATE", "END_DATE", "YEAR_END"]
+
+# stable row order of the appended dataset: cycle, then file, then row in
+# the file (parquet_scan(..., row_order=True) adds the last two). Tied
+# reports in dedupe go to the earliest row, so both selection paths sort
+# by this.
+ROW_ORDER = ["DISCLOSURE_CYCLE", "filename", "file_row_number"]
+
+
+def catalog_path(out_dir: Path) -> Path:
+    return Path(out_dir) / CATALOG_NAME
+
+
+def parquet_scan(appended: Path, row_order: bool = False) -> str:
+    extra = ", filename = true, file_row_number = true" if row_order else ""
+    return (
+        f"read_parquet('{appended.as_posix()}/*/*.parquet', "
+        f"hive_partitioning = true, union_by_name = true{extra})"
+    )
+
+
+def sql_timestamp(col: str) -> str:
+    # typed ingest stores dates as timestamps, text-era parquet as strings
+    as_text = f'CAST("{col}" AS VARCHAR)'
+    return f"COALESCE(TRY_CAST({as_text} AS TIMESTAMP), TRY_STRPTIME({as_text}, '%m/%d/%Y'))"
+
+
+def measure_columns(columns, pairs: list[tuple[str, str]], extra_pcls: set[str]) -> list[str]:
+    """Columns of any line of the (page, col) pairs, plus extra_pcls, in dataset order."""
+    pair_patterns = [re.compile(rf"^P{p}_C{c}_L\d+$") for p, c in pairs]
+    return [
+        c for c in columns
+        if any(pat.match(c) for pat in pair_patterns) or c in extra_pcls
+    ]
+
+
+def selection_sql(source: str, pcls: list[str], row_order: bool = False) -> str:
+    """
+    The measure columns of `source` with the derived hospital_type,
+    oshpd_id, BEGIN_DATE, END_DATE and YEAR_END (no filters); with
+    row_order, also the filename / file_row_number of ROW_ORDER.
+    """
+    select_list = ",\n      ".join([f'"{c}"' for c in pcls + (ROW_ORDER[1:] if row_order else [])])
+    return f"""
+    WITH src AS (
+      SELECT
+        * REPLACE (CAST(OSHPD_FACILITY_NUMBER AS VARCHAR) AS OSHPD_FACILITY_NUMBER),
+        {sql_timestamp("P0_C1_L36")} AS BEGIN_DATE,
+        {sql_timestamp("P0_C1_L37")} AS END_DATE
+      FROM {source}
+    )
+    SELECT
+      DISCLOSURE_CYCLE,
+      OSHPD_FACILITY_NUMBER,
+      REPORT_PERIOD_END_DATE,
+      {select_list},
+      -- 2. TYPE_HOSP: first 3 chars = hospital_type, rest = oshpd_id (zero-padded to 6)
+      OSHPD_FACILITY_NUMBER[1:3] AS hospital_type,
+      CASE
+        WHEN length(OSHPD_FACILITY_NUMBER[4:]) >= 6 THEN OSHPD_FACILITY_NUMBER[4:]
+        ELSE lpad(OSHPD_FACILITY_NUMBER[4:], 6, '0')
+      END AS oshpd_id,
+      BEGIN_DATE,
+      END_DATE,
+      -- 4. year of the reporting period end date
+      CAST(year(END_DATE) AS INTEGER) AS YEAR_END
+    FROM src
+    """
+
+
+def _fingerprint(appended: Path) -> str:
+    return json.dumps(file_fingerprint(appended))
+
+
+def build_catalog(
+    out_dir: Path,
+    prefix: str,
+    appended: Path,
+    pairs: list[tuple[str, str]],
+    extra_pcls: set[str],
+    catalog: Path | None = None,
+) -> Path:
+    """(Re)build the catalog entries of one prefix from its appended dataset."""
+    catalog = Path(catalog or catalog_path(out_dir))
+    scan = parquet_scan(appended, row_order=True)
+
+    con = duckdb.connect(str(catalog))
+    try:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS catalog_meta (
+                prefix VARCHAR PRIMARY KEY, appended VARCHAR, fingerprint VARCHAR,
+                pairs VARCHAR, extra_pcls VARCHAR, version INTEGER, built_at TIMESTAMP
+            )
+        """)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                prefix VARCHAR, DISCLOSURE_CYCLE BIGINT, path VARCHAR, num_rows BIGINT,
+                num_columns INTEGER, size BIGINT, mtime_ns BIGINT
+            )
+        """)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS pcl_columns (
+                prefix VARCHAR, position INTEGER, column_name VARCHAR, column_type VARCHAR,
+                page VARCHAR, col INTEGER, line INTEGER
+            )
+        """)
+
+        con.execute("BEGIN TRANSACTION")
+        for table in ("catalog_meta", "files", "pcl_columns"):
+            con.execute(f"DELETE FROM {table} WHERE prefix = ?", [prefix])
+
+        # registered files, from the parquet footers
+        rows = []
+        for part in sorted(Path(appended).glob("DISCLOSURE_CYCLE=*")):
+            dc = int(part.name.split("=", 1)[1])
+            for f in sorted(part.glob("*.parquet")):
+                md = pq.read_metadata(f)
+                st = f.stat()
+                rows.append([prefix, dc, str(f), md.num_rows, md.num_columns, st.st_size, st.st_mtime_ns])
+        if rows:
+            con.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+        wide = parquet_scan(appended)
+        con.execute(f"CREATE OR REPLACE VIEW {prefix}_wide AS SELECT * FROM {wide}")
+        described = con.execute(f"DESCRIBE SELECT * FROM {wide}").fetchall()
+        con.executemany(
+            "INSERT INTO pcl_columns VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                [prefix, i, name, ctype, *(parse_pcl(name) or (None, None, None))]
+                for i, (name, ctype, *_) in enumerate(described)
+            ],
+        )
+
+        pcls = measure_columns([d[0] for d in described], pairs, extra_pcls)
+        con.execute(f"""
+            CREATE OR REPLACE TABLE {prefix}_measures AS
+            SELECT row_number() OVER (ORDER BY {", ".join(ROW_ORDER)}) AS row_id,
+                   * EXCLUDE ({", ".join(ROW_ORDER[1:])})
+            FROM ({selection_sql(scan, pcls, row_order=True)})
+        """)
+        con.execute(f"""
+            CREATE OR REPLACE VIEW {prefix}_facility_year AS
+            SELECT * EXCLUDE (rn)
+            FROM (
+              SELECT
+                *,
+                date_diff('day', BEGIN_DATE, END_DATE) AS DAY_PER,
+                row_number() OVER (
+                  PARTITION BY P0_C1_L3, YEAR_END
+                  ORDER BY date_diff('day', BEGIN_DATE, END_DATE) DESC NULLS LAST,
+                           END_DATE DESC NULLS LAST, row_id
+                ) AS rn
+              FROM {prefix}_measures
+            )
+            WHERE rn = 1
+        """)
+
+        con.execute(
+            "INSERT INTO catalog_meta VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                prefix, str(appended), _fingerprint(appended),
+                json.dumps(sorted(map(list, pairs))), json.dumps(sorted(extra_pcls)),
+                CATALOG_VERSION, dt.datetime.now(),
+            ],
+        )
+        con.execute("COMMIT")
+        n = con.execute(f"SELECT count(*) FROM {prefix}_measures").fetchone()[0]
+    finally:
+        con.close()
+
+    print(f"Catalog: {prefix}_measures {n} rows x {len(pcls)} PCLs -> {catalog}")
+    return catalog
+
+
+def open_catalog(
+    catalog: Path,
+    prefix: str,
+    appended: Path,
+    pairs: list[tuple[str, str]],
+    extra_pcls: set[str],
+) -> duckdb.DuckDBPyConnection | None:
+    """
+    Read-only connection to the catalog if it was built from the current
+    appended files and covers the requested pairs / PCLs, else None.
+    """
+    catalog = Path(catalog)
+    if not catalog.exists():
+        return None
+    try:
+        con = duckdb.connect(str(catalog), read_only=True)
+    except duckdb.Error as e:
+        print(f"Catalog not used ({e})")
+        return None
+
+    row = con.execute(
+        "SELECT fingerprint, pairs, extra_pcls, version FROM catalog_meta WHERE prefix = ?", [prefix]
+    ).fetchone() if _has_table(con, "catalog_meta") else None
+
+    reason = None
+    if row is None:
+        reason = f"no {prefix} entries"
+    elif row[3] != CATALOG_VERSION:
+        reason = "built by an older version"
+    elif row[0] != _fingerprint(appended):
+        reason = "appended files changed since it was built"
+    elif not {tuple(p) for p in pairs} <= {tuple(p) for p in json.loads(row[1])}:
+        reason = "does not cover the requested PCL pairs"
+    elif not set(extra_pcls) <= set(json.loads(row[2])):
+        reason = "does not cover the requested PCLs"
+    if reason:
+        print(f"Catalog not used: {reason} ({catalog})")
+        con.close()
+        return None
+    return con
+
+
+def _has_table(con: duckdb.DuckDBPyConnection, name: str) -> bool:
+    return bool(con.execute(
+        "SELECT count(*) FROM duckdb_tables() WHERE table_name = ?", [name]
+    ).fetchone()[0])
+
+
+def catalog_columns(con: duckdb.DuckDBPyConnection, prefix: str) -> list[str]:
+    """Columns of the appended dataset, in order, without reading any parquet."""
+    return [r[0] for r in con.execute(
+        "SELECT column_name FROM pcl_columns WHERE prefix = ? ORDER BY position", [prefix]
+    ).fetchall()]
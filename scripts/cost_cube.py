@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Feb  6 09:52:38 2026
+
+@author: eloaeza
+
+On-disk facility x year x revenue-center cube of the ccr stage output.
+
+The measures, cost_to_charge_ratio and payer costs of `calc` are written as
+one dense float64 array
+
+    <out_dir>/cost_cube/cube.npy      (measure, facility, year, revenue_center)
+    <out_dir>/cost_cube/index.json    axis labels, facility names, source key
+
+(NaN where calc has no row). CostCube opens the array with mmap_mode="r", so
+opening costs a header read and a selection by measure, facility, year or
+revenue center is a numpy view into the file:
+
+    cube = CostCube.open(config.cube_dir)
+    cube.sel(measure="cost_to_charge_ratio", revenue_center=250)   # facility x year
+    cube.frame(revenue_center=250)    # like calc[calc["revenue_center"] == 250]
+"""
+from __future__ import annotations
+
+import json
+import shutil
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmark_engine import KEYS, MEASURES, PAYER_REVENUE
+
+
+CUBE_MEASURES = [*MEASURES, "cost_to_charge_ratio", *PAYER_REVENUE]
+AXES = ["measure", "facility", "year", "revenue_center"]
+
+
+def write_cost_cube(calc: pd.DataFrame, cube_dir: Path, source: str | None = None) -> Path:
+    """
+    Scatter calc into the cube and write it to cube_dir. `source` (e.g. the
+    ccr stage key) is stored so an unchanged cube is not rebuilt.
+    """
+    cube_dir = Path(cube_dir)
+    measures = [m for m in CUBE_MEASURES if m in calc.columns]
+    calc = calc.dropna(subset=KEYS + ["revenue_center"])
+
+    facility_codes, facilities = pd.factorize(calc["OSHPD_FACILITY_NUMBER"].astype(str), sort=True)
+    year_codes, years = pd.factorize(calc["YEAR_END"].astype("int64"), sort=True)
+    rc_codes, rcs = pd.factorize(calc["revenue_center"].astype("int64"), sort=True)
+
+    # a facility can show up under two names in one year (dedupe is by name)
+    cell = pd.DataFrame({"f": facility_codes, "y": year_codes, "r": rc_codes})
+    dup = cell.duplicated().to_numpy()
+    if dup.any():
+        warnings.warn(f"{int(dup.sum())} facility-year-revenue center rows repeat; keeping the first")
+    keep = ~dup
+
+    # last name reported per facility
+    names = (
+        calc[["OSHPD_FACILITY_NUMBER", "YEAR_END", "P0_C1_L3"]]
+        .astype({"OSHPD_FACILITY_NUMBER": str})
+        .sort_values("YEAR_END", kind="stable")
+        .drop_duplicates("OSHPD_FACILITY_NUMBER", keep="last")
+        .set_index("OSHPD_FACILITY_NUMBER")["P0_C1_L3"]
+    )
+
+    tmp = cube_dir.with_name(cube_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    shape = (len(measures), len(facilities), len(years), len(rcs))
+    values = np.lib.format.open_memmap(tmp / "cube.npy", mode="w+", dtype=np.float64, shape=shape)
+    values[:] = np.nan
+    f, y, r = facility_codes[keep], year_codes[keep], rc_codes[keep]
+    for k, m in enumerate(measures):
+        values[k, f, y, r] = calc[m].to_numpy(dtype=np.float64, na_value=np.nan)[keep]
+    values.flush()
+    del values
+
+    (tmp / "index.json").write_text(json.dumps({
+        "axes": AXES,
+        "shape": list(shape),
+        "measure": measures,
+        "facility": [str(x) for x in facilities],
+        "facility_name": [None if pd.isna(names.get(x)) else str(names.get(x)) for x in facilities],
+        "year": [int(x) for x in years],
+        "revenue_center": [int(x) for x in rcs],
+        "source": source,
+    }, indent=1))
+
+    shutil.rmtree(cube_dir, ignore_errors=True)
+    tmp.rename(cube_dir)
+    print(f"Cost cube {shape} -> {cube_dir}")
+    return cube_dir
+
+
+def cube_source(cube_dir: Path) -> str | None:
+    """The source key the cube at cube_dir was built from, if any."""
+    index = Path(cube_dir) / "index.json"
+    if not index.exists() or not (Path(cube_dir) / "cube.npy").exists():
+        return None
+    return json.loads(index.read_text()).get("source")
+
+
+class CostCube:
+    """Read-only, memory-mapped cube written by write_cost_cube()."""
+
+    def __init__(self, values: np.ndarray, index: dict):
+        self.values = values
+        self.index = index
+        self.measures: list[str] = index["measure"]
+        self.facilities: list[str] = index["facility"]
+        self.years: list[int] = index["year"]
+        self.revenue_centers: list[int] = index["revenue_center"]
+        self._pos = {
+            axis: {label: i for i, label in enumerate(index[axis])} for axis in AXES
+        }
+
+    @classmethod
+    def open(cls, cube_dir: Path) -> "CostCube":
+        cube_dir = Path(cube_dir)
+        index = json.loads((cube_dir / "index.json").read_text())
+        values = np.load(cube_dir / "cube.npy", mmap_mode="r")
+        return cls(values, index)
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self.values.shape
+
+    def position(self, axis: str, label) -> int:
+        if axis == "facility":
+            label = str(label)
+        elif axis != "measure":
+            label = int(label)
+        try:
+            return self._pos[axis][label]
+        except KeyError:
+            raise KeyError(f"{label!r} is not on the {axis} axis") from None
+
+    def sel(self, measure=None, facility=None, year=None, revenue_center=None) -> np.ndarray:
+        """
+        View of the cube with the given labels picked (each picked axis is
+        dropped); the other axes stay in (measure, facility, year,
+        revenue_center) order.
+        """
+        labels = dict(zip(AXES, (measure, facility, year, revenue_center)))
+        key = tuple(
+            slice(None) if label is None else self.position(axis, label)
+            for axis, label in labels.items()
+        )
+        return self.values[key]
+
+    def frame(self, facility=None, year=None, revenue_center=None, dropna: bool = True) -> pd.DataFrame:
+        """
+        Long frame like calc (keys, revenue_center, measures) for the picked
+        cells; rows where every measure is NaN are left out.
+        """
+        fs = [self.position("facility", facility)] if facility is not None else range(len(self.facilities))
+        ys = [self.position("year", year)] if year is not None else range(len(self.years))
+        rs = [self.position("revenue_center", revenue_center)] if revenue_center is not None else range(len(self.revenue_centers))
+        block = self.values[:, fs][:, :, ys][:, :, :, rs].reshape(len(self.measures), -1)
+
+        f, y, r = (a.ravel() for a in np.meshgrid(np.asarray(fs), np.asarray(ys), np.asarray(rs), indexing="ij"))
+        df = pd.DataFrame({
+            "OSHPD_FACILITY_NUMBER": np.asarray(self.facilities, dtype=object)[f],
+            "P0_C1_L3": np.asarray(self.index["facility_name"], dtype=object)[f],
+            "YEAR_END": np.asarray(self.years)[y],
+            "revenue_center": np.asarray(self.revenue_centers)[r],
+        })
+        for k, m in enumerate(self.measures):
+            df[m] = block[k]
+        if dropna:
+            df = df[~np.isnan(block).all(axis=0)].reset_index(drop=True)
+        return df
+
+
+def main():
+    from step_2_create_df import PipelineConfig
+
+    config = PipelineConfig()
+    calc = pd.read_parquet(config.stage_dir / "ccr.parquet")
+    write_cost_cube(calc, config.cube_dir)
+    cube = CostCube.open(config.cube_dir)
+    print(cube.shape)
+    print(cube.frame(revenue_center=250).describe())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Jan 27 10:22:36 2026
+
+@author: eloaeza
+
+IDs of hospitals that submit non-comparable reports, from the HADR
+documentation PDF.
+
+Instead of hardcoded page indexes, the pages are located by searching for
+the "non-comparable" heading followed by a list of facility IDs (lines
+starting with a 9-digit ID) on the same page, so a table of contents or a
+passing mention does not match; the section runs from that page until the
+first following page without such lines. Text is extracted with
+extract_text(), as the original page 7-8 extraction did. The result is
+cached next to the outputs as a versioned CSV,
+
+    <cache_dir>/non_comparable_ids_<pdf sha256[:12]>.csv   (+ .json)
+
+so the PDF is only parsed again when its contents change.
+"""
+from __future__ import annotations
+
+import json
+import re
+import warnings
+from pathlib import Path
+
+import pandas as pd
+import pdfplumber
+
+from stage_cache import file_sha256
+
+
+PDF = Path("/Users/eloaeza/projects/hadr-project/data_raw/hadrfull-db-documentation-rpe2015-xx.pdf")
+CACHE_DIR = Path("/Users/eloaeza/projects/hadr-project/outputs/non_comparable")
+
+SECTION_RE = re.compile(r"non[-\s]?comparable", re.IGNORECASE)
+ID_RE = re.compile(r"\b\d{9}\b")
+LIST_RE = re.compile(r"^\s*\d{9}\b", re.MULTILINE)
+
+# where the section was in the 2015 documentation (0-indexed pages 8-9);
+# only used when the heading cannot be found
+FALLBACK_PAGE_IDXS = [7, 8]
+
+# bump when the extraction rules change so old cache files are not reused
+EXTRACTOR_VERSION = 2
+
+
+def section_start(txt: str) -> int | None:
+    """Offset of the first heading on the page with an ID list below it."""
+    for m in SECTION_RE.finditer(txt):
+        if LIST_RE.search(txt, m.end()):
+            return m.start()
+    return None
+
+
+def find_section(pdf: pdfplumber.PDF) -> list[int]:
+    """0-indexed pages of the non-comparable section, or [] if not found."""
+    pages: list[int] = []
+    for i, page in enumerate(pdf.pages):
+        txt = page.extract_text() or ""
+        if not pages:
+            if section_start(txt) is not None:
+                pages.append(i)
+        elif LIST_RE.search(txt):
+            pages.append(i)
+        else:
+            break
+    return pages
+
+
+def extract_ids(pdf_path: Path) -> tuple[pd.DataFrame, list[int]]:
+    """(OSHPD_FACILITY_NUMBER, page) for every ID in the section, and its pages."""
+    with pdfplumber.open(pdf_path) as pdf:
+        pages = find_section(pdf)
+        if not pages:
+            warnings.warn(
+                f"no non-comparable section found in {pdf_path.name}; "
+                f"falling back to pages {FALLBACK_PAGE_IDXS}"
+            )
+            pages = [i for i in FALLBACK_PAGE_IDXS if i < len(pdf.pages)]
+
+        rows = []
+        for i in pages:
+            txt = pdf.pages[i].extract_text() or ""
+            start = section_start(txt) if i == pages[0] else None
+            if start is not None:
+                # IDs above the heading belong to the previous section
+                txt = txt[start:]
+            rows.extend((fid, i) for fid in ID_RE.findall(txt))
+
+    df = (
+        pd.DataFrame(rows, columns=["OSHPD_FACILITY_NUMBER", "page"])
+        .drop_duplicates("OSHPD_FACILITY_NUMBER")
+        .sort_values("OSHPD_FACILITY_NUMBER")
+        .reset_index(drop=True)
+    )
+    return df.astype({"OSHPD_FACILITY_NUMBER": "string"}), pages
+
+
+def cache_path(cache_dir: Path, sha: str) -> Path:
+    return cache_dir / f"non_comparable_ids_{sha[:12]}.csv"
+
+
+def non_comparable_ids(
+    pdf_path: Path = PDF,
+    cache_dir: Path | None = CACHE_DIR,
+    refresh: bool = False,
+) -> pd.DataFrame:
+    """
+    Sorted unique OSHPD_FACILITY_NUMBER of hospitals with non-comparable
+    reports. Read from the cache when this exact PDF was parsed before.
+    """
+    pdf_path = Path(pdf_path)
+    sha = file_sha256(pdf_path)
+
+    if cache_dir is not None:
+        out = cache_path(Path(cache_dir), sha)
+        meta_path = out.with_suffix(".json")
+        if out.exists() and meta_path.exists() and not refresh:
+            meta = json.loads(meta_path.read_text())
+            if meta.get("extractor_version") == EXTRACTOR_VERSION:
+                df = pd.read_csv(out, dtype={"OSHPD_FACILITY_NUMBER": "string"})
+                return df[["OSHPD_FACILITY_NUMBER"]]
+
+    df, pages = extract_ids(pdf_path)
+
+    if cache_dir is not None:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(out, index=False)
+        meta_path.write_text(json.dumps({
+            "pdf": pdf_path.name,
+            "sha256": sha,
+            "pages": pages,
+            "n_ids": len(df),
+            "extractor_version": EXTRACTOR_VERSION,
+        }, indent=2))
+        print("wrote:", out)
+
+    return df[["OSHPD_FACILITY_NUMBER"]]
+
+
+def main():
+    df = non_comparable_ids(PDF, CACHE_DIR, refresh=True)
+    print("n exclude IDs:", len(df))
+    print(df["OSHPD_FACILITY_NUMBER"].head(10).tolist())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Jan 26 08:51:20 2026
+
+@author: eloaeza
+
+Command line entry point for the HADR cost benchmark.
+
+    python scripts/hadr_benchmark.py ingest [step1 options]
+    python scripts/hadr_benchmark.py run --years 2018-2022 --data-dir ... --out-dir ...
+    python scripts/hadr_benchmark.py run --from ccr      # force ccr and later stages
+    python scripts/hadr_benchmark.py bench [bench_pipeline options]
+    python scripts/hadr_benchmark.py sweep --years 2018-2022 2019-2021 --payers combined split
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+import bench_pipeline
+import step1_append_single_sheet
+from instrument import recording
+from reconcile import ATOL, PUBLISHED_COLUMNS, RTOL, missing_columns, n_failures
+from reconcile import summarize as reconcile_summary
+from scenarios import PAYER_GROUPS, load_scenarios, scenario_grid, summarize, sweep
+from stage_cache import DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_BYTES, StageCache
+from step_2_create_df import BACKENDS, CCR_ENGINES, DATA_DIR, OUT_DIR, STAGES, PipelineConfig, run_pipeline
+
+
+def year_range(s: str) -> tuple[int, int]:
+    # "2018-2022" or "2020"
+    lo, _, hi = s.partition("-")
+    return int(lo), int(hi or lo)
+
+
+def column_mapping(s: str) -> tuple[str, str]:
+    # "tot_medicare=medicare_cost"
+    ours, sep, theirs = s.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME=COLUMN, got {s!r}")
+    return ours, theirs
+
+
+def revenue_center_cutoff(s: str) -> int | None:
+    # "416", or "none" for no cutoff
+    return None if s.lower() == "none" else int(s)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(prog="hadr-benchmark", description="HADR hospital cost benchmark")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    sub.add_parser(
+        "ingest", add_help=False,
+        help="convert HADR workbooks to parquet (options as step1_append_single_sheet.py)",
+    )
+
+    sub.add_parser(
+        "bench", add_help=False,
+        help="time the pipeline on synthetic data (options as bench_pipeline.py)",
+    )
+
+    run = sub.add_parser("run", help="run the benchmark stages")
+    run.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    run.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    run.add_argument("--years", type=year_range, default=(2018, 2022), help="e.g. 2018-2022")
+    run.add_argument("--max-revenue-center", type=int, default=416)
+    run.add_argument(
+        "--backend", choices=BACKENDS, default="pandas",
+        help="polars: run selection through summary as one lazy Polars plan "
+             "(totals / summary within 1e-12 relative of pandas, not bit for bit)",
+    )
+    run.add_argument(
+        "--ccr-engine", choices=CCR_ENGINES, default="pandas",
+        help="compute the CCR / payer costs with numpy arrays or a lazy Polars plan",
+    )
+    run.add_argument(
+        "--from", dest="start_at", choices=STAGES,
+        help="recompute this stage and everything after it even if cached",
+    )
+    run.add_argument(
+        "--no-cache", action="store_true",
+        help="do not use the stage cache (with --from, earlier stages come from the last run)",
+    )
+    run.add_argument(
+        "--published-column", type=column_mapping, action="append", default=[],
+        help="published CSV column for facility / year / tot_medicare / tot_private, "
+             f"e.g. year=cy (default: {','.join(f'{k}={v}' for k, v in PUBLISHED_COLUMNS.items())})",
+    )
+    run.add_argument("--tolerance-abs", type=float, default=ATOL, help="reconcile: dollars")
+    run.add_argument("--tolerance-rel", type=float, default=RTOL, help="reconcile: share of the published value")
+    run.add_argument(
+        "--fail-on-mismatch", action="store_true",
+        help="exit with status 1 if any facility-year is outside the reconcile tolerances",
+    )
+    run.add_argument("--cache-dir", type=Path, help="default: <out-dir>/stage_cache")
+    run.add_argument("--cache-max-gb", type=float, default=DEFAULT_MAX_BYTES / 1024**3)
+    run.add_argument("--cache-max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS)
+    step1_append_single_sheet.add_report_args(run)
+
+    sw = sub.add_parser("sweep", help="benchmark totals for many scenarios in one pass")
+    sw.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    sw.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    sw.add_argument("--scenarios", type=Path, help="JSON list of scenarios (see scenarios.py)")
+    sw.add_argument(
+        "--years", type=year_range, nargs="+", default=[(2018, 2022)],
+        help="year windows for a scenario grid, e.g. 2018-2022 2019-2021",
+    )
+    sw.add_argument("--payers", choices=list(PAYER_GROUPS), nargs="+", default=["combined"])
+    sw.add_argument(
+        "--max-revenue-center", type=revenue_center_cutoff, nargs="+", default=[416],
+        help="revenue-center cutoffs for the grid ('none' for no cutoff)",
+    )
+    sw.add_argument("--out", type=Path, help="default: <out-dir>/scenario_sweep.parquet")
+    step1_append_single_sheet.add_report_args(sw)
+    return ap.parse_known_args(argv)
+
+
+def run_sweep(args) -> None:
+    config = PipelineConfig(data_dir=args.data_dir, out_dir=args.out_dir)
+    if args.scenarios:
+        scenarios = load_scenarios(args.scenarios)
+    else:
+        scenarios = scenario_grid(args.years, args.payers, args.max_revenue_center)
+    report = step1_append_single_sheet.report_from_args(
+        "sweep", args, {"scenarios": [vars(s) for s in scenarios]}
+    )
+    with recording(report):
+        result = sweep(config, scenarios)
+    if report is not None and args.report:
+        report.write(args.report)
+
+    out = args.out or config.out_dir / "scenario_sweep.parquet"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    result.to_parquet(out, index=False)
+    print("wrote:", out)
+    print(summarize(result).to_string(index=False))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args, rest = parse_args(argv)
+
+    if args.command == "ingest":
+        step1_append_single_sheet.main(rest)
+        return
+    if args.command == "bench":
+        bench_pipeline.main(rest)
+        return
+    if rest:
+        raise SystemExit(f"unrecognized arguments: {' '.join(rest)}")
+    if args.command == "sweep":
+        run_sweep(args)
+        return
+
+    config = PipelineConfig(
+        data_dir=args.data_dir,
+        out_dir=args.out_dir,
+        years=args.years,
+        max_revenue_center=args.max_revenue_center,
+        ccr_engine=args.ccr_engine,
+        backend=args.backend,
+        published_columns=tuple({**PUBLISHED_COLUMNS, **dict(args.published_column)}.items()),
+        reconcile_atol=args.tolerance_abs,
+        reconcile_rtol=args.tolerance_rel,
+    )
+    if config.published_csv.exists():
+        missing = missing_columns(config.published_csv, dict(config.published_columns))
+        if missing:
+            raise SystemExit(
+                f"{config.published_csv.name} has no column(s) {missing}; "
+                "map them with --published-column, e.g. --published-column tot_medicare=<column>"
+            )
+
+    cache = None
+    if not args.no_cache:
+        cache = StageCache(
+            args.cache_dir or config.cache_dir,
+            max_bytes=int(args.cache_max_gb * 1024**3),
+            max_age_days=args.cache_max_age_days,
+        )
+    report = step1_append_single_sheet.report_from_args("run", args, {"config": vars(config)})
+    with recording(report):
+        out = run_pipeline(config, start_at=args.start_at, cache=cache)
+    if report is not None and args.report:
+        report.write(args.report)
+    print(out["totals"].describe())
+
+    if "reconcile" in out:
+        print(reconcile_summary(out["reconcile"]).to_string(index=False))
+        failures = n_failures(out["reconcile"])
+        if failures and args.fail_on_mismatch:
+            result = out["reconcile"]
+            print(result[result["status"] == "mismatch"].head(20).to_string(index=False))
+            raise SystemExit(f"{failures} facility-year values outside the reconcile tolerances")
+    elif args.fail_on_mismatch:
+        raise SystemExit(f"no published data to reconcile against: {config.published_csv}")
+
+
+if __name__ == "__main__":
+    main()
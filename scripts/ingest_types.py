@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Jan 24 10:12:31 2026
+
+@author: eloaeza
+
+Per-column typing for the step1 ingest.
+
+Cells arrive as the Python values openpyxl hands back (int, float, str,
+datetime, None). Each PCL column gets one kind -- int64, float64, date or
+string -- either inferred from its values or forced by an override (e.g. a
+pcl,type csv derived from the PCL labels workbook), and is
+written as the matching Arrow type. Cells that do not fit the chosen kind
+are nulled and reported instead of silently turning the column into text.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import re
+from collections import Counter
+from pathlib import Path
+
+import pyarrow as pa
+
+
+KINDS = {
+    "int64": pa.int64(),
+    "float64": pa.float64(),
+    "date": pa.timestamp("us"),
+    "string": pa.string(),
+}
+
+# identifiers keep their leading zeros
+STRING_COLUMNS = {"OSHPD_FACILITY_NUMBER", "P0_C1_L3"}
+
+# share of non-null cells allowed to miss the column's kind before the
+# whole column falls back to string
+MAX_COERCION_ERROR_RATE = 0.01
+
+# strings pd.read_excel turns into NaN by default, plus Excel error literals
+NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+    "#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!",
+}
+
+_INT_RE = re.compile(r"^[+-]?\d+$")
+
+
+def normalize_cell(v):
+    # read_excel conventions: integral floats -> int, NA-like strings -> None
+    if v is None:
+        return None
+    if isinstance(v, float):
+        if v != v:
+            return None
+        if v.is_integer():
+            return int(v)
+    elif isinstance(v, str) and v in NA_STRINGS:
+        return None
+    return v
+
+
+def _parse_number(s: str):
+    s = s.strip().replace(",", "")
+    if _INT_RE.match(s):
+        return int(s)
+    return float(s)
+
+
+def value_kind(v) -> str:
+    if isinstance(v, bool):
+        return "string"
+    if isinstance(v, int):
+        return "int64"
+    if isinstance(v, float):
+        return "float64"
+    if isinstance(v, (dt.datetime, dt.date)):
+        return "date"
+    if isinstance(v, str):
+        try:
+            return "int64" if isinstance(_parse_number(v), int) else "float64"
+        except ValueError:
+            pass
+        try:
+            dt.datetime.fromisoformat(v.strip())
+            return "date"
+        except ValueError:
+            pass
+    return "string"
+
+
+def infer_kind(values: list, max_error_rate: float = MAX_COERCION_ERROR_RATE) -> str:
+    """
+    Pick a kind for normalized cell values. Numeric columns are inferred as
+    float64 even when every value is integral, so a column keeps one type
+    across batches and cycles; int64 only comes from overrides. All-null
+    columns are float64.
+    """
+    counts = Counter(value_kind(v) for v in values if v is not None)
+    n = sum(counts.values())
+    if n == 0:
+        return "float64"
+
+    allowed = max_error_rate * n
+    numeric = counts["int64"] + counts["float64"]
+    if n - counts["date"] <= allowed and counts["date"]:
+        return "date"
+    if n - numeric <= allowed:
+        return "float64"
+    return "string"
+
+
+def coerce_value(v, kind: str):
+    if kind == "string":
+        return str(v)
+    if kind == "date":
+        if isinstance(v, dt.datetime):
+            return v
+        if isinstance(v, dt.date):
+            return dt.datetime(v.year, v.month, v.day)
+        if isinstance(v, str):
+            return dt.datetime.fromisoformat(v.strip())
+        raise ValueError(v)
+    if isinstance(v, bool) or isinstance(v, (dt.datetime, dt.date)):
+        raise ValueError(v)
+    if isinstance(v, str):
+        v = _parse_number(v)
+    if kind == "int64":
+        if isinstance(v, float):
+            raise ValueError(v)
+        return int(v)
+    return float(v)
+
+
+def coerce_column(values: list, kind: str) -> tuple[pa.Array, list[int]]:
+    """Arrow array of `kind` plus the row positions that failed to coerce."""
+    out = [None] * len(values)
+    bad = []
+    for i, v in enumerate(values):
+        if v is None:
+            continue
+        try:
+            out[i] = coerce_value(v, kind)
+        except (ValueError, TypeError, OverflowError):
+            bad.append(i)
+    return pa.array(out, type=KINDS[kind]), bad
+
+
+def column_kinds(
+    names: list[str],
+    columns: list[list],
+    overrides: dict[str, str] | None = None,
+    max_error_rate: float = MAX_COERCION_ERROR_RATE,
+) -> dict[str, str]:
+    overrides = overrides or {}
+    kinds = {}
+    for name, values in zip(names, columns):
+        if name in overrides:
+            kinds[name] = overrides[name]
+        elif name in STRING_COLUMNS:
+            kinds[name] = "string"
+        else:
+            kinds[name] = infer_kind(values, max_error_rate)
+    return kinds
+
+
+def typed_table(
+    names: list[str],
+    columns: list[list],
+    dc: int,
+    kinds: dict[str, str],
+    row_offset: int = 0,
+) -> tuple[pa.Table, list[dict]]:
+    """
+    Build the DISCLOSURE_CYCLE + PCL table from normalized column values.
+    Returns the table and one error record per cell that did not coerce.
+    """
+    n = len(columns[0]) if columns else 0
+    arrays = [pa.array([dc] * n, type=pa.int64())]
+    errors = []
+    for name, values in zip(names, columns):
+        arr, bad = coerce_column(values, kinds[name])
+        arrays.append(arr)
+        errors.extend(
+            {
+                "DISCLOSURE_CYCLE": dc,
+                "column": name,
+                "row": row_offset + i,
+                "value": str(values[i]),
+                "type": kinds[name],
+            }
+            for i in bad
+        )
+    table = pa.Table.from_arrays(arrays, names=["DISCLOSURE_CYCLE"] + list(names))
+    return table, errors
+
+
+def load_column_types(path: Path) -> dict[str, str]:
+    """Read a pcl,type override csv (type one of int64/float64/date/string)."""
+    with open(path, newline="") as fh:
+        out = {row["pcl"]: row["type"].strip() for row in csv.DictReader(fh)}
+    unknown = {t for t in out.values() if t not in KINDS}
+    if unknown:
+        raise ValueError(f"Unknown column types in {path}: {sorted(unknown)}")
+    return out
+
+
+def write_coercion_report(errors: list[dict], out_csv: Path) -> Path | None:
+    if not errors:
+        out_csv.unlink(missing_ok=True)
+        return None
+    with open(out_csv, "w", newline="") as fh:
+        w = csv.DictWriter(fh, fieldnames=["DISCLOSURE_CYCLE", "column", "row", "value", "type"])
+        w.writeheader()
+        w.writerows(errors)
+    return out_csv
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Feb  1 10:05:31 2026
+
+@author: eloaeza
+
+Timed spans and a JSON run report for the ingest and benchmark scripts.
+
+    report = RunReport("benchmark", profile_stage="ccr")
+    with recording(report):
+        with span("ccr") as s:
+            calc = compute_calc(df)
+            s.rows_out(calc)
+    report.write("run_report.json")
+
+Each span records wall time, peak RSS while it ran, row/column counts in
+and out, and any extra attributes (e.g. a DuckDB query profile from
+duckdb_profile()). Spans nest. Code calls the module-level span(), so
+without an active report it costs almost nothing.
+
+The span named by `profile_stage` is also run under cProfile (a .prof file
+for snakeviz / pstats) or pyinstrument (an .html file, if installed).
+"""
+from __future__ import annotations
+
+import cProfile
+import datetime as dt
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import duckdb
+
+
+PROFILERS = ["cprofile", "pyinstrument"]
+
+
+# ---- memory -----------------------------------------------------------------
+
+def current_rss() -> int | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+def max_rss() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class PeakRSS:
+    """Peak resident memory while the block runs (sampled every 5 ms)."""
+
+    def __enter__(self):
+        self.peak = current_rss() or 0
+        self._stop = threading.Event()
+        self._thread = None
+        if current_rss() is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, current_rss() or 0)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.peak = max(self.peak, current_rss() or 0)
+        else:
+            # no per-process RSS without /proc: fall back to the process peak
+            self.peak = max_rss()
+
+
+# ---- spans ------------------------------------------------------------------
+
+def shape(obj) -> dict:
+    """rows / cols of a DataFrame, Arrow table or parquet file."""
+    if obj is None:
+        return {}
+    if hasattr(obj, "num_rows") and hasattr(obj, "num_columns"):
+        return {"rows": obj.num_rows, "cols": obj.num_columns}
+    if hasattr(obj, "shape") and len(obj.shape) == 2:
+        return {"rows": int(obj.shape[0]), "cols": int(obj.shape[1])}
+    if isinstance(obj, (str, Path)) and str(obj).endswith(".parquet") and Path(obj).is_file():
+        import pyarrow.parquet as pq
+        md = pq.read_metadata(obj)
+        return {"rows": md.num_rows, "cols": md.num_columns}
+    if hasattr(obj, "__len__"):
+        return {"rows": len(obj)}
+    return {}
+
+
+class Span:
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = dict(attrs)
+        self.children: list[dict] = []
+        self.start = time.time()
+        self.secs = None
+        self.peak_rss_mb = None
+
+    def set(self, **attrs) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def rows_in(self, *objs) -> "Span":
+        self.attrs["in"] = [shape(o) for o in objs]
+        return self
+
+    def rows_out(self, obj) -> "Span":
+        self.attrs["out"] = shape(obj)
+        return self
+
+    def to_dict(self) -> dict:
+        d = {
+            "name": self.name,
+            "start": dt.datetime.fromtimestamp(self.start).isoformat(timespec="milliseconds"),
+            "secs": None if self.secs is None else round(self.secs, 4),
+            "peak_rss_mb": self.peak_rss_mb,
+            **self.attrs,
+        }
+        if self.children:
+            d["children"] = self.children
+        return d
+
+
+class RunReport:
+    def __init__(
+        self,
+        name: str,
+        meta: dict | None = None,
+        profile_stage: str | None = None,
+        profiler: str = "cprofile",
+        profile_dir: Path | None = None,
+    ):
+        self.name = name
+        self.meta = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "argv": sys.argv,
+            **(meta or {}),
+        }
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.profile_dir = Path(profile_dir or ".")
+        self.spans: list[dict] = []
+        self._stack: list[Span] = []
+        self.start = time.time()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        s = Span(name, attrs)
+        self._stack.append(s)
+        try:
+            with PeakRSS() as mem, self._maybe_profile(name):
+                t0 = time.perf_counter()
+                try:
+                    yield s
+                finally:
+                    s.secs = time.perf_counter() - t0
+            s.peak_rss_mb = round(mem.peak / 1024**2, 1)
+        finally:
+            self._stack.pop()
+            self.add(s.to_dict())
+
+    def current(self) -> Span | None:
+        return self._stack[-1] if self._stack else None
+
+    def add(self, span: dict) -> None:
+        """Attach a finished span (e.g. one sent back by a worker process)."""
+        if self._stack:
+            self._stack[-1].children.append(span)
+        else:
+            self.spans.append(span)
+
+    @contextmanager
+    def _maybe_profile(self, name: str):
+        if name != self.profile_stage:
+            yield
+            return
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+        if self.profiler == "pyinstrument":
+            from pyinstrument import Profiler
+            prof = Profiler()
+            prof.start()
+            try:
+                yield
+            finally:
+                prof.stop()
+                out = self.profile_dir / f"{self.name}_{safe}.html"
+                out.write_text(prof.output_html())
+        else:
+            prof = cProfile.Profile()
+            prof.enable()
+            try:
+                yield
+            finally:
+                prof.disable()
+                out = self.profile_dir / f"{self.name}_{safe}.prof"
+                prof.dump_stats(out)
+        print("wrote profile:", out)
+        self.meta.setdefault("profiles", []).append(str(out))
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started": dt.datetime.fromtimestamp(self.start).isoformat(timespec="seconds"),
+            "secs": round(time.time() - self.start, 4),
+            "peak_rss_mb": round(max_rss() / 1024**2, 1),
+            "meta": self.meta,
+            "spans": self.spans,
+        }
+
+    def write(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2, default=str))
+        print("wrote run report:", path)
+        return path
+
+
+class _NoSpan:
+    def set(self, **attrs):
+        return self
+
+    def rows_in(self, *objs):
+        return self
+
+    def rows_out(self, obj):
+        return self
+
+
+_NO_SPAN = _NoSpan()
+_active: RunReport | None = None
+
+
+@contextmanager
+def recording(report: RunReport | None):
+    """Make `report` the target of span() for the duration of the block."""
+    global _active
+    previous, _active = _active, report
+    try:
+        yield report
+    finally:
+        _active = previous
+
+
+@contextmanager
+def span(name: str, **attrs):
+    if _active is None:
+        yield _NO_SPAN
+        return
+    with _active.span(name, **attrs) as s:
+        yield s
+
+
+def active() -> RunReport | None:
+    return _active
+
+
+# ---- DuckDB -----------------------------------------------------------------
+
+def _operators(node: dict, depth: int = 0) -> list[dict]:
+    out = []
+    for child in node.get("children", []):
+        out.append({
+            "depth": depth,
+            "operator": child.get("operator_name") or child.get("operator_type"),
+            "secs": round(child.get("operator_timing", 0.0), 6),
+            "rows": child.get("operator_cardinality"),
+            "rows_scanned": child.get("operator_rows_scanned"),
+        })
+        out.extend(_operators(child, depth + 1))
+    return out
+
+
+@contextmanager
+def duckdb_profile(con: duckdb.DuckDBPyConnection, label: str = "query"):
+    """
+    Profile the last query run on `con` inside the block and attach the
+    summary (latency, rows, per-operator timings) to the current span.
+    No-op without an active report.
+    """
+    if _active is None or _active.current() is None:
+        yield
+        return
+    fd, tmp = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    con.execute("PRAGMA enable_profiling = 'json'")
+    con.execute(f"PRAGMA profiling_output = '{tmp}'")
+    try:
+        yield
+    finally:
+        con.execute("PRAGMA disable_profiling")
+        try:
+            prof = json.loads(Path(tmp).read_text() or "{}")
+        except ValueError:
+            prof = {}
+        Path(tmp).unlink(missing_ok=True)
+        if prof:
+            _active.current().attrs.setdefault("duckdb", {})[label] = {
+                "latency": prof.get("latency"),
+                "cpu_time": prof.get("cpu_time"),
+                "rows_returned": prof.get("rows_returned"),
+                "rows_scanned": prof.get("cumulative_rows_scanned"),
+                "operators": _operators(prof),
+            }
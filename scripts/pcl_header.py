@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Feb  2 14:26:09 2026
+
+@author: eloaeza
+
+Column names for a HADR sheet from its page / column / line header rows.
+
+    OSHPD_FACILITY_NUMBER, REPORT_PERIOD_END_DATE, P{page}_C{col}_L{line}, ...
+
+Columns with a missing or blank page, column or line become COL_{j:05d},
+and repeated names get a __dupNNN suffix (second one __dup002, ...).
+
+A sheet has thousands of columns but only a few hundred distinct header
+values, so each header row is factorized and only the distinct values go
+through pcl_token(); names, fallbacks and duplicate suffixes are then
+built on whole arrays. The result is kept per header fingerprint, so a
+header seen before (the same layout in another cycle or sheet) is looked
+up instead of rebuilt.
+"""
+from __future__ import annotations
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+FIXED = ["OSHPD_FACILITY_NUMBER", "REPORT_PERIOD_END_DATE"]
+
+_COLUMNS: dict[str, list[str]] = {}
+MAX_CACHED = 64
+
+
+def pcl_token(x) -> str:
+    if pd.isna(x):
+        return ""
+    try:
+        f = float(x)
+        if f.is_integer():
+            return str(int(f))
+        return f"{f:.10f}".rstrip("0").rstrip(".")   # keeps 4.1 as "4.1"
+    except Exception:
+        return str(x).strip()
+
+
+def tokens(values) -> np.ndarray:
+    """pcl_token() of every value, computed once per distinct value."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    mapped = np.array([pcl_token(u) for u in uniques] + [""], dtype=object)
+    # missing values have code -1, i.e. the trailing ""
+    return mapped[codes]
+
+
+def build_pcl_column_ids(header4: pd.DataFrame) -> list[str]:
+    page, col, line = (tokens(header4.iloc[k].to_numpy(dtype=object)) for k in range(3))
+
+    names = "P" + page + "_C" + col + "_L" + line
+    missing = (page == "") | (col == "") | (line == "")
+    if missing.any():
+        j = np.flatnonzero(missing)
+        names[j] = np.char.add("COL_", np.char.zfill(j.astype(str), 5)).astype(object)
+
+    names[:2] = FIXED[:len(names)]
+    return names.tolist()
+
+
+def make_unique(cols: list[str]) -> list[str]:
+    names = pd.Series(cols, dtype=object)
+    n = names.groupby(names, sort=False).cumcount().to_numpy() + 1
+    dup = np.flatnonzero(n > 1)
+    if not len(dup):
+        return list(cols)
+    out = names.to_numpy(copy=True)
+    out[dup] = out[dup] + np.char.add("__dup", np.char.zfill(n[dup].astype(str), 3)).astype(object)
+    return out.tolist()
+
+
+def header_fingerprint(header4: pd.DataFrame) -> str:
+    h = hashlib.sha1()
+    h.update(str(header4.shape[1]).encode())
+    for k in range(3):
+        h.update(repr(header4.iloc[k].tolist()).encode())
+    return h.hexdigest()
+
+
+def pcl_columns(header4: pd.DataFrame) -> list[str]:
+    """Unique column names for a sheet from its first header rows."""
+    key = header_fingerprint(header4)
+    cols = _COLUMNS.get(key)
+    if cols is None:
+        cols = make_unique(build_pcl_column_ids(header4))
+        if len(_COLUMNS) >= MAX_CACHED:
+            _COLUMNS.pop(next(iter(_COLUMNS)))
+        _COLUMNS[key] = cols
+    return list(cols)
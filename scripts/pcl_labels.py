@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Feb  2 09:18:26 2026
+
+@author: eloaeza
+
+PCL -> label index from hadrfull-db-pcl-labels-2015-20xx.xlsx.
+
+The labels workbook is read once and compiled into a table of
+(sheet, pcl, page, col, line, label), with the canonical PCL built from
+Page / Col / Line (so "3.3" stays "3.3"). The table is cached per workbook,
+
+    <cache_dir>/pcl_labels_<xlsx sha256[:12]>.parquet   (+ .json)
+
+and PCLLabelIndex answers both kinds of question asked of it:
+
+    index.label("P10_C11_L60")      # O(1) PCL -> label
+    index.prefix("P12_C3")          # all lines of a page/column, in line order
+    index.rename_map(df.columns)    # PCL columns -> "PCL__LABEL"
+
+sheet is "financial_utilization" (blank "Worksheet 1 / 2") or
+"cost_allocation" ("Cost Alloc").
+"""
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from pcl_header import pcl_token
+from stage_cache import file_sha256
+
+
+PCL_LABELS_XLSX = Path("/Users/eloaeza/projects/hadr-project/data_raw/hadrfull-db-pcl-labels-2015-20xx.xlsx")
+CACHE_DIR = Path("/Users/eloaeza/projects/hadr-project/outputs/pcl_labels")
+
+SHEETS = ["financial_utilization", "cost_allocation"]
+FIN = "financial_utilization"
+
+PREFIX_RE = re.compile(r"^P(?P<page>\d+(?:\.\d+)?)(?:_C(?P<col>\d+(?:\.\d+)?))?_?$")
+
+# bump when the compile rules change so old cache files are not reused
+INDEX_VERSION = 1
+
+
+def sanitize(s: str) -> str:
+    s = str(s).strip()
+    s = re.sub(r"[^\w]+", "_", s)
+    s = re.sub(r"_+", "_", s).strip("_")
+    return s[:120]
+
+
+def compile_labels(labels_xlsx: Path) -> pd.DataFrame:
+    """sheet, pcl, page, col, line, label for every labelled PCL in the workbook."""
+    df = pd.read_excel(labels_xlsx, sheet_name="HADR", engine="openpyxl")
+
+    page = df["Page"].map(pcl_token)
+    col = df["Col"].map(pcl_token)
+    line = df["Line"].map(pcl_token)
+    ws = df["Worksheet 1 / 2"].astype("object")
+    sheet = pd.Series(pd.NA, index=df.index, dtype="object")
+    sheet[ws.isna()] = "financial_utilization"
+    sheet[ws.astype(str).str.strip().eq("Cost Alloc")] = "cost_allocation"
+
+    desc = df["Data File Description"]
+    out = pd.DataFrame({
+        "sheet": sheet,
+        "pcl": "P" + page + "_C" + col + "_L" + line,
+        "page": page,
+        "col": col,
+        "line": line,
+        "label": desc.where(desc.notna(), "").astype(str).map(sanitize),
+    })
+    keep = out["sheet"].notna() & page.ne("") & col.ne("") & line.ne("") & out["label"].ne("")
+    out = out[keep]
+
+    # one label per PCL; the last row wins, as it did in the old dict loops
+    out = out.drop_duplicates(["sheet", "pcl"], keep="last")
+    line_num = pd.to_numeric(out["line"], errors="coerce")
+    col_num = pd.to_numeric(out["col"], errors="coerce")
+    out = (
+        out.assign(_c=col_num, _l=line_num)
+        .sort_values(["sheet", "page", "_c", "_l"], kind="stable")
+        .drop(columns=["_c", "_l"])
+        .reset_index(drop=True)
+    )
+    return out.astype("string")
+
+
+class PCLLabelIndex:
+    """Lookups over a compile_labels() table."""
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table
+        self._labels: dict[str, dict[str, str]] = {s: {} for s in SHEETS}
+        self._groups: dict[str, dict[tuple[str, str], dict[str, str]]] = {s: {} for s in SHEETS}
+        # table is sorted by page, col, line, so each group comes out in line order
+        for sheet, pcl, page, col, label in zip(
+            table["sheet"], table["pcl"], table["page"], table["col"], table["label"]
+        ):
+            self._labels[sheet][pcl] = label
+            self._groups[sheet].setdefault((page, col), {})[pcl] = label
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def labels(self, sheet: str = FIN) -> dict[str, str]:
+        """PCL -> label for one sheet (the old load_pcl_labels_split maps)."""
+        return self._labels[sheet]
+
+    def label(self, pcl: str, sheet: str = FIN, default: str | None = None) -> str | None:
+        return self._labels[sheet].get(pcl, default)
+
+    def lines(self, page: str, col: str, sheet: str = FIN) -> dict[str, str]:
+        """PCL -> label for every line of page / col, in line order."""
+        return self._groups[sheet].get((pcl_token(page), pcl_token(col)), {})
+
+    def prefix(self, prefix: str, sheet: str = FIN) -> dict[str, str]:
+        """
+        PCL -> label under "P12_C3" (all lines of a column) or "P12" (all
+        columns and lines of a page), in col / line order.
+        """
+        m = PREFIX_RE.match(prefix)
+        if not m:
+            raise ValueError(f"not a page or page/column prefix: {prefix!r}")
+        if m["col"] is not None:
+            return self.lines(m["page"], m["col"], sheet)
+        out: dict[str, str] = {}
+        for (page, _), group in self._groups[sheet].items():
+            if page == m["page"]:
+                out.update(group)
+        return out
+
+    def frame(self, prefix: str, sheet: str = FIN) -> pd.DataFrame:
+        """prefix() as a pcl / label DataFrame."""
+        items = self.prefix(prefix, sheet)
+        return pd.DataFrame({"pcl": list(items), "label": list(items.values())})
+
+    def rename_map(self, columns, sheet: str = FIN) -> dict[str, str]:
+        """Labelled PCL columns -> "PCL__LABEL" (stable PCL id + label suffix)."""
+        labels = self._labels[sheet]
+        return {c: f"{c}__{labels[c]}" for c in columns if c in labels}
+
+
+def cache_path(cache_dir: Path, sha: str) -> Path:
+    return cache_dir / f"pcl_labels_{sha[:12]}.parquet"
+
+
+def pcl_label_index(
+    labels_xlsx: Path = PCL_LABELS_XLSX,
+    cache_dir: Path | None = CACHE_DIR,
+    refresh: bool = False,
+) -> PCLLabelIndex:
+    """
+    PCLLabelIndex for the labels workbook, read from the cache when this
+    exact workbook was compiled before.
+    """
+    labels_xlsx = Path(labels_xlsx)
+    sha = file_sha256(labels_xlsx)
+
+    if cache_dir is not None:
+        out = cache_path(Path(cache_dir), sha)
+        meta_path = out.with_suffix(".json")
+        if out.exists() and meta_path.exists() and not refresh:
+            meta = json.loads(meta_path.read_text())
+            if meta.get("index_version") == INDEX_VERSION:
+                return PCLLabelIndex(pd.read_parquet(out).astype("string"))
+
+    table = compile_labels(labels_xlsx)
+
+    if cache_dir is not None:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        table.to_parquet(out, index=False)
+        meta_path.write_text(json.dumps({
+            "xlsx": labels_xlsx.name,
+            "sha256": sha,
+            "n_labels": table["sheet"].value_counts().to_dict(),
+            "index_version": INDEX_VERSION,
+        }, indent=2))
+        print("wrote:", out)
+
+    return PCLLabelIndex(table)
+
+
+def main():
+    index = pcl_label_index(PCL_LABELS_XLSX, CACHE_DIR, refresh=True)
+    for sheet in SHEETS:
+        print(f"{sheet}: {len(index.labels(sheet))} labels")
+    print(index.frame("P12_C3").head(10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Jan 24 15:40:02 2026
+
+@author: eloaeza
+
+Long (EAV) store of the numeric PCL measures, written next to the wide
+per-cycle parquet at ingest:
+
+    {prefix}_long/DISCLOSURE_CYCLE={dc}/data_0.parquet
+
+one row per non-null cell with columns
+
+    OSHPD_FACILITY_NUMBER  dictionary<string>
+    page                   dictionary<string>   ("10", "3.3", ...)
+    col                    int16
+    line                   int16
+    value                  float64
+
+sorted by (page, col, line, OSHPD_FACILITY_NUMBER). Picking "P12_C1..C16,
+all lines" is a predicate on page/col that row-group stats can prune,
+instead of a DESCRIBE + regex over thousands of wide column names:
+
+    SELECT * FROM read_parquet('fin_util_long/*/*.parquet', hive_partitioning = true)
+    WHERE page = '12' AND col BETWEEN 1 AND 16
+
+Once the store exists, step1 keeps it in step with the wide files whether
+or not --long is passed. Wide files from an --untyped ingest hold text;
+their PCL columns are stacked when every value parses as a number.
+"""
+
+from __future__ import annotations
+
+import re
+import shutil
+import warnings
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+
+PCL_RE = re.compile(r"^P(?P<page>\d+(?:\.\d+)?)_C(?P<col>\d+)_L(?P<line>\d+)$")
+
+LONG_ROW_GROUP_ROWS = 64_000
+
+LONG_SCHEMA = pa.schema([
+    ("OSHPD_FACILITY_NUMBER", pa.dictionary(pa.int32(), pa.string())),
+    ("page", pa.dictionary(pa.int16(), pa.string())),
+    ("col", pa.int16()),
+    ("line", pa.int16()),
+    ("value", pa.float64()),
+])
+
+
+def parse_pcl(name: str) -> tuple[str, int, int] | None:
+    m = PCL_RE.match(name)
+    if not m:
+        return None
+    return m["page"], int(m["col"]), int(m["line"])
+
+
+def numeric_values(column: pa.ChunkedArray) -> pa.Array | None:
+    """The column as numbers, or None; text only if every value parses."""
+    values = column.combine_chunks()
+    if pa.types.is_floating(values.type) or pa.types.is_integer(values.type):
+        return values
+    if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+        try:
+            return values.cast(pa.float64())
+        except pa.ArrowInvalid:
+            return None
+    return None
+
+
+def wide_to_long(wide: pa.Table) -> pa.Table:
+    """Stack the numeric P{p}_C{c}_L{l} columns of one wide table, dropping nulls."""
+    if "OSHPD_FACILITY_NUMBER" not in wide.column_names:
+        warnings.warn("no OSHPD_FACILITY_NUMBER column; the long table is empty")
+        return LONG_SCHEMA.empty_table()
+    fac = wide.column("OSHPD_FACILITY_NUMBER").combine_chunks().cast(pa.string())
+
+    parts = []
+    n_numeric = 0
+    for name in wide.column_names:
+        key = parse_pcl(name)
+        values = numeric_values(wide.column(name)) if key is not None else None
+        if values is None:
+            continue
+        n_numeric += 1
+        idx = pc.indices_nonzero(pc.is_valid(values))
+        if len(idx) == 0:
+            continue
+        page, col, line = key
+        n = len(idx)
+        parts.append(pa.table({
+            "OSHPD_FACILITY_NUMBER": fac.take(idx),
+            "page": pa.array([page] * n, pa.string()),
+            "col": pa.array([col] * n, pa.int16()),
+            "line": pa.array([line] * n, pa.int16()),
+            "value": values.take(idx).cast(pa.float64()),
+        }))
+
+    if not n_numeric:
+        warnings.warn("no numeric PCL columns to stack; the long table is empty")
+    if not parts:
+        return LONG_SCHEMA.empty_table()
+
+    long = pa.concat_tables(parts)
+    long = long.sort_by([
+        ("page", "ascending"), ("col", "ascending"),
+        ("line", "ascending"), ("OSHPD_FACILITY_NUMBER", "ascending"),
+    ])
+    return pa.table({
+        "OSHPD_FACILITY_NUMBER": long["OSHPD_FACILITY_NUMBER"].dictionary_encode(),
+        "page": long["page"].dictionary_encode().cast(LONG_SCHEMA.field("page").type),
+        "col": long["col"],
+        "line": long["line"],
+        "value": long["value"],
+    }).cast(LONG_SCHEMA)
+
+
+def long_dir(out_dir: Path, prefix: str = "fin_util") -> Path:
+    return out_dir / f"{prefix}_long"
+
+
+def build_long_store(
+    out_dir: Path,
+    prefix: str = "fin_util",
+    cycles: set[int] | None = None,
+) -> Path:
+    """
+    (Re)write the long partitions for `cycles` (None = all) from the
+    per-cycle {prefix}_{dc}.parquet files; same incremental rules as
+    step1's append_partitioned, and a partition older than its per-cycle
+    file is rewritten as well.
+    """
+    root = long_dir(out_dir, prefix)
+    root.mkdir(parents=True, exist_ok=True)
+
+    sources = {
+        int(re.search(r"_(\d+)$", p.stem).group(1)): p
+        for p in out_dir.glob(f"{prefix}_[0-9]*.parquet")
+    }
+
+    for part in root.glob("DISCLOSURE_CYCLE=*"):
+        if int(part.name.split("=", 1)[1]) not in sources:
+            shutil.rmtree(part)
+
+    for dc, src in sorted(sources.items()):
+        part = root / f"DISCLOSURE_CYCLE={dc}"
+        data = part / "data_0.parquet"
+        if (
+            data.exists()
+            and cycles is not None
+            and dc not in cycles
+            and data.stat().st_mtime_ns >= src.stat().st_mtime_ns
+        ):
+            continue
+        if part.exists():
+            shutil.rmtree(part)
+        part.mkdir(parents=True)
+        long = wide_to_long(pq.read_table(src))
+        pq.write_table(
+            long, part / "data_0.parquet",
+            row_group_size=LONG_ROW_GROUP_ROWS,
+            compression="zstd",
+        )
+        print("Wrote long partition:", part, "rows:", long.num_rows)
+
+    return root
+
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Jan 30 11:37:52 2026
+
+@author: eloaeza
+
+Polars backend for the benchmark pipeline in step_2_create_df.py.
+
+Selection, facility-id split, exclusion filter, year window, case mix
+join, dedupe, unpivot, CCR, payer costs, totals and the CCR summary form
+one LazyFrame plan over scan_parquet. The optimizer pushes the column
+projection and filters into the scan. The dedupe, ccr, totals and summary
+outputs come from one collect_all() call, so the shared part of the plan
+runs once. dedupe and ccr are identical to the pandas stages. Totals and
+the CCR mean use Polars' native (multi-threaded) sums, which round
+differently from pandas' compensated groupby sums; they agree to SUM_RTOL
+(see assert_matches_pandas).
+
+The exclusion list (PDF) and case mix (xlsx) are inputs to the plan and
+still come from their own cached stages.
+"""
+
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+
+from benchmark_engine import KEYS
+from benchmark_polars import calc_plan
+
+
+DEDUPE_GROUP = ["P0_C1_L3", "YEAR_END"]
+
+# relative tolerance for totals / summary against pandas. A facility-year
+# sums a few hundred revenue-center costs, so the two summation orders
+# differ by a few ULP (~1e-15 relative); 1e-12 leaves ample room.
+SUM_RTOL = 1e-12
+
+# dropped after dedupe, as in step_2_create_df.dedupe()
+DEDUPE_DROP = [
+    "P0_C1_L37", "P0_C1_L36", "P0_C1_L2", "BEGIN_DATE", "END_DATE",
+    "DISCLOSURE_CYCLE", "REPORT_PERIOD_END_DATE", "hospital_type", "DAY_PER",
+]
+
+
+def scan_appended(appended: Path) -> pl.LazyFrame:
+    """
+    All DISCLOSURE_CYCLE partitions, matched by column name (cycles do not
+    share one column set), with the cycle as a column.
+    """
+    parts = []
+    for part in sorted(Path(appended).glob("DISCLOSURE_CYCLE=*")):
+        dc = int(part.name.split("=", 1)[1])
+        for f in sorted(part.glob("*.parquet")):
+            parts.append(
+                pl.scan_parquet(f).with_columns(pl.lit(dc, dtype=pl.Int64).alias("DISCLOSURE_CYCLE"))
+            )
+    return pl.concat(parts, how="diagonal_relaxed")
+
+
+def parse_timestamp(name: str, dtype: pl.DataType) -> pl.Expr:
+    # typed ingest stores dates as timestamps, text-era parquet as strings
+    col = pl.col(name)
+    if dtype.is_temporal():
+        return col.cast(pl.Datetime("us"))
+    text = col.cast(pl.String).str.strip_chars()
+    return pl.coalesce(
+        text.str.to_datetime("%Y-%m-%d %H:%M:%S", strict=False, time_unit="us"),
+        text.str.to_datetime("%Y-%m-%d", strict=False, time_unit="us"),
+        text.str.to_datetime("%m/%d/%Y", strict=False, time_unit="us"),
+    )
+
+
+def selection_plan(
+    scan: pl.LazyFrame,
+    pairs: list[tuple[str, str]],
+    extra_pcls: set[str],
+    exclude_ids: pd.DataFrame,
+    years: tuple[int, int],
+) -> pl.LazyFrame:
+    """Polars select_measures(): comparable hospitals in the year window."""
+    schema = scan.collect_schema()
+    pair_patterns = [re.compile(rf"^P{p}_C{c}_L\d+$") for p, c in pairs]
+    needed_pcls = [
+        c for c in schema.names()
+        if any(pat.match(c) for pat in pair_patterns) or c in extra_pcls
+    ]
+    excluded = pl.LazyFrame(
+        {"OSHPD_FACILITY_NUMBER": exclude_ids["OSHPD_FACILITY_NUMBER"].astype(str).tolist()},
+        schema={"OSHPD_FACILITY_NUMBER": pl.String},
+    )
+    fac = pl.col("OSHPD_FACILITY_NUMBER")
+    rest = fac.str.slice(3)
+
+    return (
+        scan
+        .select(
+            "DISCLOSURE_CYCLE",
+            fac.cast(pl.String),
+            "REPORT_PERIOD_END_DATE",
+            *needed_pcls,
+        )
+        # 3. keep only Comparable hospitals (nulls are kept, like ~isin)
+        .join(excluded, on="OSHPD_FACILITY_NUMBER", how="anti", nulls_equal=False)
+        .with_columns(
+            # 2. TYPE_HOSP: first 3 chars = hospital_type, rest = oshpd_id (zero-padded)
+            fac.str.slice(0, 3).alias("hospital_type"),
+            rest.str.zfill(6).alias("oshpd_id"),
+            parse_timestamp("P0_C1_L36", schema["P0_C1_L36"]).alias("BEGIN_DATE"),
+            parse_timestamp("P0_C1_L37", schema["P0_C1_L37"]).alias("END_DATE"),
+        )
+        # 4. year of the reporting period end date, relevant years only
+        .with_columns(pl.col("END_DATE").dt.year().alias("YEAR_END"))
+        .filter(pl.col("YEAR_END").is_between(years[0], years[1]))
+    )
+
+
+def case_mix_plan(selected: pl.LazyFrame, case_mix: pd.DataFrame) -> pl.LazyFrame:
+    """5./6. Case mix index by hospital and year, rounded to 2 decimals."""
+    cm = (
+        pl.from_pandas(case_mix[["facility_key", "period_year", "case_mix_index"]])
+        .lazy()
+        .drop_nulls("facility_key")
+        .select(
+            pl.col("facility_key").cast(pl.Int64),
+            pl.col("period_year").cast(pl.Int32).alias("YEAR_END"),
+            pl.col("case_mix_index").cast(pl.Float64),
+        )
+        # first one in workbook column order, as CaseMixIndex
+        .unique(["facility_key", "YEAR_END"], keep="first", maintain_order=True)
+    )
+    return (
+        selected
+        .with_columns(pl.col("oshpd_id").cast(pl.Int64, strict=False).alias("facility_key"))
+        .join(cm, on=["facility_key", "YEAR_END"], how="left", maintain_order="left")
+        .drop("facility_key")
+        .with_columns(pl.col("case_mix_index").round(2))
+    )
+
+
+def dedupe_plan(df: pl.LazyFrame) -> pl.LazyFrame:
+    """7. Longest period, then latest end date, per hospital-year."""
+    return (
+        df
+        .with_columns((pl.col("END_DATE") - pl.col("BEGIN_DATE")).dt.total_days().alias("DAY_PER"))
+        .sort(
+            DEDUPE_GROUP + ["DAY_PER", "END_DATE"],
+            descending=[False, False, True, True],
+            nulls_last=True,
+            maintain_order=True,
+        )
+        .unique(DEDUPE_GROUP, keep="first", maintain_order=True)
+        .drop(DEDUPE_DROP)
+    )
+
+
+def drop_empty_revenue_centers_plan(calc: pl.LazyFrame, max_revenue_center: int | None) -> pl.LazyFrame:
+    if max_revenue_center is not None:
+        calc = calc.filter(pl.col("revenue_center") < max_revenue_center)
+    return calc.filter(pl.col("cost_to_charge_ratio").is_not_null().any().over("revenue_center"))
+
+
+def skipna_sum(name: str) -> pl.Expr:
+    # pandas' sum(min_count=1): NaN skipped, null when there is nothing to add
+    v = pl.col(name).fill_nan(None)
+    return pl.when(v.count() > 0).then(v.sum())
+
+
+def totals_plan(calc: pl.LazyFrame, keys: list[str] = KEYS) -> pl.LazyFrame:
+    costs = {"medicare_cost_rc": "tot_medicare", "private_cost_rc": "tot_private"}
+    return (
+        calc
+        .drop_nulls(keys)
+        .group_by(keys, maintain_order=True)
+        # a facility-year with no cost at all stays null rather than 0
+        .agg(skipna_sum(c).alias(name) for c, name in costs.items())
+        .sort(keys, maintain_order=True)
+    )
+
+
+def midpoint_median(name: str) -> pl.Expr:
+    # (a + b) / 2 of the two middle values, as pandas computes it; Polars'
+    # median interpolates as a + (b - a) / 2. Groups have at least one value
+    # here (drop_empty_revenue_centers_plan).
+    s = pl.col(name).drop_nulls().drop_nans().sort()
+    n = s.len()
+    return ((s.gather((n - 1) // 2) + s.gather(n // 2)) / 2).first()
+
+
+def summary_plan(calc: pl.LazyFrame, value: str = "cost_to_charge_ratio") -> pl.LazyFrame:
+    v = pl.col(value)
+    return (
+        calc
+        .drop_nulls("revenue_center")
+        .group_by("revenue_center", maintain_order=True)
+        .agg(
+            v.fill_nan(None).mean().alias("mean"),
+            midpoint_median(value).alias("median"),
+            v.min().alias("min"),
+            v.max().alias("max"),
+            v.quantile(0.25, interpolation="linear").alias("p25"),
+            v.quantile(0.75, interpolation="linear").alias("p75"),
+            v.count().alias("n"),
+        )
+        .sort("revenue_center")
+    )
+
+
+def run_polars(
+    appended: Path,
+    pairs: list[tuple[str, str]],
+    extra_pcls: set[str],
+    exclude_ids: pd.DataFrame,
+    case_mix: pd.DataFrame,
+    years: tuple[int, int],
+    max_revenue_center: int | None = 416,
+) -> dict[str, pa.Table]:
+    """dedupe, ccr, totals and summary outputs of one lazy plan, as Arrow."""
+    selected = selection_plan(scan_appended(appended), pairs, extra_pcls, exclude_ids, years)
+    deduped = dedupe_plan(case_mix_plan(selected, case_mix))
+    calc = calc_plan(deduped, deduped.collect_schema())
+    calc = drop_empty_revenue_centers_plan(calc, max_revenue_center)
+
+    plans = {
+        "dedupe": deduped,
+        "ccr": calc,
+        "totals": totals_plan(calc),
+        "summary": summary_plan(calc),
+    }
+    frames = pl.collect_all(list(plans.values()))
+    return {name: df.to_arrow() for name, df in zip(plans, frames)}
+
+
+def assert_matches_pandas(
+    outputs: dict[str, pa.Table],
+    reference: dict[str, pd.DataFrame],
+    rtol: float = SUM_RTOL,
+) -> None:
+    """
+    Regression check: each run_polars() output must equal the pandas
+    stage output in `reference`; exactly for dedupe and ccr, to `rtol` for
+    totals and summary.
+    """
+    for name, ref in reference.items():
+        exact = name not in ("totals", "summary")
+        pd.testing.assert_frame_equal(
+            ref.reset_index(drop=True), outputs[name].to_pandas(),
+            check_dtype=False, check_exact=exact, rtol=rtol, atol=0.0,
+        )
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Feb  4 09:27:53 2026
+
+@author: eloaeza
+
+Reconcile the replicated facility totals with OHCA's published Hospital
+Cost Data (Hospital-Cost-Data-Updated-June-2025-1.csv).
+
+Both sides are keyed on (facility, year): the facility number is reduced
+to the 6-digit OSHPD id as an integer (the 3-digit hospital type prefix
+of the 9-digit number is dropped) and joined once on that key. For each
+measure the absolute and relative deltas are computed as arrays, and a
+pair is a mismatch when
+
+    |replicated - published| > atol + rtol * |published|
+
+(the numpy.isclose rule). Facility-years present on one side only are
+reported as missing_replicated / missing_published. The result is one
+row per facility-year and measure, mismatches first, largest delta first.
+
+The published column names are not fixed across releases, so they are a
+mapping (replicated name -> published name) with PUBLISHED_COLUMNS as the
+default; only "cy" is confirmed, so missing_columns() checks a mapping
+against the CSV header before the pipeline runs.
+"""
+from __future__ import annotations
+
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+PUBLISHED_CSV = Path("/Users/eloaeza/projects/hadr-project/data_raw/Hospital-Cost-Data-Updated-June-2025-1.csv")
+
+# replicated column -> published column
+PUBLISHED_COLUMNS = {
+    "facility": "oshpd_id",
+    "year": "cy",
+    "tot_medicare": "medicare_cost",
+    "tot_private": "commercial_cost",
+}
+KEY = ["facility_key", "YEAR_END"]
+
+ATOL = 1.0        # dollars
+RTOL = 0.005      # 0.5% of the published value
+
+STATUS_ORDER = ["mismatch", "missing_replicated", "missing_published", "match", "both_missing"]
+
+
+def facility_key(ids: pd.Series) -> pd.Series:
+    """6-digit OSHPD id as Int64 from a 9-digit facility number or a 6-digit id."""
+    digits = ids.astype("string").str.replace(r"\D", "", regex=True)
+    digits = digits.where(digits.str.len() != 9, digits.str[3:])
+    return pd.to_numeric(digits, errors="coerce").astype("Int64")
+
+
+def measures_of(columns: dict[str, str]) -> list[str]:
+    return [c for c in columns if c not in ("facility", "year")]
+
+
+def published_names(columns: dict[str, str]) -> list[str]:
+    return [columns["facility"], columns["year"]] + [columns[m] for m in measures_of(columns)]
+
+
+def missing_columns(path: Path = PUBLISHED_CSV, columns: dict[str, str] = PUBLISHED_COLUMNS) -> list[str]:
+    """Published column names in `columns` that the CSV header does not have."""
+    header = set(pd.read_csv(path, nrows=0).columns)
+    return [c for c in published_names(columns) if c not in header]
+
+
+def load_published(path: Path = PUBLISHED_CSV, columns: dict[str, str] = PUBLISHED_COLUMNS) -> pd.DataFrame:
+    """facility_key, YEAR_END and the measures, under the replicated names."""
+    measures = measures_of(columns)
+    wanted = published_names(columns)
+    df = pd.read_csv(path, usecols=lambda c: c in wanted, dtype={columns["facility"]: "string"})
+    missing = [c for c in wanted if c not in df.columns]
+    if missing:
+        raise KeyError(f"{Path(path).name} has no column(s) {missing}; see PUBLISHED_COLUMNS")
+    out = pd.DataFrame({
+        "facility_key": facility_key(df[columns["facility"]]),
+        "YEAR_END": pd.to_numeric(df[columns["year"]], errors="coerce").astype("Int64"),
+    })
+    for m in measures:
+        out[m] = pd.to_numeric(df[columns[m]], errors="coerce").astype("float64")
+    return out
+
+
+def replicated_totals(totals: pd.DataFrame, measures: list[str]) -> pd.DataFrame:
+    out = pd.DataFrame({
+        "facility_key": facility_key(totals["OSHPD_FACILITY_NUMBER"]),
+        "YEAR_END": pd.to_numeric(totals["YEAR_END"], errors="coerce").astype("Int64"),
+    })
+    for m in measures:
+        out[m] = totals[m].to_numpy(dtype="float64", na_value=np.nan)
+    return out
+
+
+def _unique(df: pd.DataFrame, side: str) -> pd.DataFrame:
+    df = df.dropna(subset=KEY)
+    dup = df.duplicated(KEY)
+    if dup.any():
+        warnings.warn(f"{int(dup.sum())} duplicate facility-years in the {side} data; keeping the first")
+        df = df[~dup]
+    return df
+
+
+def reconcile(
+    totals: pd.DataFrame,
+    published: pd.DataFrame,
+    measures: list[str] | None = None,
+    atol: float = ATOL,
+    rtol: float = RTOL,
+) -> pd.DataFrame:
+    """
+    One row per facility-year and measure: facility_key, YEAR_END, measure,
+    replicated, published, abs_delta, rel_delta, status; mismatches first,
+    by abs_delta descending.
+    """
+    measures = measures or measures_of(PUBLISHED_COLUMNS)
+    ours = _unique(replicated_totals(totals, measures), "replicated")
+    theirs = _unique(published[KEY + measures], "published")
+
+    joined = ours.merge(theirs, on=KEY, how="outer", suffixes=("_rep", "_pub"), indicator=True)
+    side = joined.pop("_merge").to_numpy()
+    n = len(joined)
+
+    parts = []
+    for m in measures:
+        rep = joined[f"{m}_rep"].to_numpy(dtype="float64", na_value=np.nan)
+        pub = joined[f"{m}_pub"].to_numpy(dtype="float64", na_value=np.nan)
+        abs_delta = np.abs(rep - pub)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel_delta = np.where(pub != 0, abs_delta / np.abs(pub), np.nan)
+
+        status = np.full(n, "match", dtype=object)
+        status[abs_delta > atol + rtol * np.abs(pub)] = "mismatch"
+        status[np.isnan(rep) & ~np.isnan(pub)] = "missing_replicated"
+        status[~np.isnan(rep) & np.isnan(pub)] = "missing_published"
+        status[np.isnan(rep) & np.isnan(pub)] = "both_missing"
+        status[side == "left_only"] = "missing_published"
+        status[side == "right_only"] = "missing_replicated"
+
+        parts.append(pd.DataFrame({
+            "facility_key": joined["facility_key"].to_numpy(),
+            "YEAR_END": joined["YEAR_END"].to_numpy(),
+            "measure": m,
+            "replicated": rep,
+            "published": pub,
+            "abs_delta": abs_delta,
+            "rel_delta": rel_delta,
+            "status": pd.Categorical(status, categories=STATUS_ORDER),
+        }))
+
+    out = pd.concat(parts, ignore_index=True)
+    out = out.sort_values(
+        ["status", "abs_delta", "measure", "facility_key", "YEAR_END"],
+        ascending=[True, False, True, True, True],
+        na_position="last",
+        kind="stable",
+    )
+    return out.astype({"facility_key": "Int64", "YEAR_END": "Int64", "measure": "string"}).reset_index(drop=True)
+
+
+def summarize(result: pd.DataFrame) -> pd.DataFrame:
+    """Facility-years per measure and status."""
+    return (
+        result.groupby(["measure", "status"], observed=False)
+        .size()
+        .unstack("status")
+        .reset_index()
+    )
+
+
+def n_failures(result: pd.DataFrame, include_missing: bool = False) -> int:
+    """Mismatches (and, optionally, facility-years missing on either side)."""
+    failing = ["mismatch"] + (["missing_replicated", "missing_published"] if include_missing else [])
+    return int(result["status"].isin(failing).sum())
+
+
+def main():
+    from step_2_create_df import PipelineConfig
+
+    config = PipelineConfig()
+    totals = pd.read_parquet(config.stage_dir / "totals.parquet")
+    result = reconcile(totals, load_published(PUBLISHED_CSV))
+    print(summarize(result).to_string(index=False))
+    print(result.head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Feb  3 10:41:17 2026
+
+@author: eloaeza
+
+Scenario sweep: the benchmark totals for many year windows, payer column
+groups and revenue-center cutoffs in one pass.
+
+The parquet scan, exclusions, case mix and dedupe run once over the union
+of all scenarios (all years, all PCL pairs any scenario needs), and the
+revenue-center cube and CCR are computed once on that. Dedupe is per
+hospital-year, so a year window is just a row mask afterwards; each
+scenario then only sums its own payer columns and applies its cutoff.
+The totals per scenario are the same as run_pipeline() gives for that
+configuration.
+
+Scenarios come from a JSON file,
+
+    [
+      {"name": "base", "years": [2018, 2022]},
+      {"name": "split_2019", "years": [2019, 2019], "payers": "split",
+       "max_revenue_center": 416},
+      {"name": "mc_only", "payers": {"medicare_mc": ["P12_C3", "P12_C4"]}}
+    ]
+
+or from a grid of --years / --payers / --max-revenue-center values (see
+hadr_benchmark.py sweep). The result is one tidy table:
+
+    scenario, OSHPD_FACILITY_NUMBER, P0_C1_L3, YEAR_END, payer, total_cost
+"""
+from __future__ import annotations
+
+import itertools
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmark_engine import (
+    CCR_CHARGE,
+    CCR_COST,
+    KEYS,
+    PAYER_REVENUE,
+    drop_empty_revenue_centers,
+    facility_totals,
+    revenue_center_cube,
+)
+from case_mix import case_mix_store
+from exclusions import non_comparable_ids
+from instrument import span
+from stage_cache import to_pandas
+from step_2_create_df import PipelineConfig, dedupe, prepare, select_measures
+
+
+# payer column groups (P12 gross inpatient + outpatient revenue)
+PAYER_GROUPS = {
+    "combined": {
+        "medicare": ["P12_C1", "P12_C2", "P12_C3", "P12_C4"],
+        "private": ["P12_C13", "P12_C14", "P12_C15", "P12_C16"],
+    },
+    "split": {
+        "medicare_traditional": ["P12_C1", "P12_C2"],
+        "medicare_managed_care": ["P12_C3", "P12_C4"],
+        "private_traditional": ["P12_C13", "P12_C14"],
+        "private_managed_care": ["P12_C15", "P12_C16"],
+    },
+}
+
+RESULT_COLUMNS = ["scenario", *KEYS, "payer", "total_cost"]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    years: tuple[int, int] = (2018, 2022)
+    # payer -> Px_Cx revenue columns summed before applying the CCR
+    payers: dict[str, list[str]] = field(default_factory=lambda: dict(PAYER_GROUPS["combined"]))
+    max_revenue_center: int | None = 416
+
+    @property
+    def measures(self) -> list[str]:
+        return sorted({*CCR_COST, CCR_CHARGE, *(c for cs in self.payers.values() for c in cs)})
+
+
+def scenario_from_dict(d: dict) -> Scenario:
+    payers = d.get("payers", "combined")
+    if isinstance(payers, str):
+        payers = PAYER_GROUPS[payers]
+    kw = {"name": d["name"], "payers": {k: list(v) for k, v in payers.items()}}
+    if "years" in d:
+        years = d["years"]
+        kw["years"] = (int(years[0]), int(years[-1]))
+    if "max_revenue_center" in d:
+        kw["max_revenue_center"] = d["max_revenue_center"]
+    return Scenario(**kw)
+
+
+def load_scenarios(path: Path) -> list[Scenario]:
+    return [scenario_from_dict(d) for d in json.loads(Path(path).read_text())]
+
+
+def scenario_grid(
+    years: list[tuple[int, int]],
+    payers: list[str] = ("combined",),
+    max_revenue_centers: list[int | None] = (416,),
+) -> list[Scenario]:
+    """Every combination, named like "2018-2022_combined_rc416"."""
+    return [
+        Scenario(
+            name=f"{y[0]}-{y[1]}_{p}_rc{rc if rc is not None else 'all'}",
+            years=y,
+            payers=dict(PAYER_GROUPS[p]),
+            max_revenue_center=rc,
+        )
+        for y, p, rc in itertools.product(years, payers, max_revenue_centers)
+    ]
+
+
+def pairs_of(measures: list[str]) -> list[tuple[str, str]]:
+    # "P12_C3" -> ("12", "3")
+    return [tuple(m[1:].split("_C", 1)) for m in measures]
+
+
+def shared_selection(
+    config: PipelineConfig,
+    scenarios: list[Scenario],
+) -> tuple[pd.DataFrame, list[str]]:
+    """Deduplicated facility-years covering every scenario, and the measures used."""
+    years = (min(s.years[0] for s in scenarios), max(s.years[1] for s in scenarios))
+    measures = sorted({m for s in scenarios for m in s.measures})
+
+    exclude_ids = non_comparable_ids(config.documentation_pdf, config.exclusion_cache_dir)
+    case_mix = case_mix_store(config.case_mix_xlsx, config.case_mix_parquet)
+    with span("selection", years=list(years)) as sp:
+        selected = to_pandas(select_measures(
+            config.appended, pairs_of(measures), set(config.extra_pcls), exclude_ids, years,
+        ))
+        sp.rows_out(selected)
+    with span("dedupe") as sp:
+        deduped = dedupe(prepare(selected, case_mix))
+        sp.rows_in(selected).rows_out(deduped)
+    return deduped, measures
+
+
+def sweep(config: PipelineConfig, scenarios: list[Scenario]) -> pd.DataFrame:
+    """Facility-year payer totals for every scenario, as one tidy table."""
+    names = [s.name for s in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError("scenario names must be unique")
+
+    deduped, measures = shared_selection(config, scenarios)
+
+    with span("ccr") as sp:
+        key_frame, lines, cube = revenue_center_cube(deduped, measures)
+        k = {m: i for i, m in enumerate(measures)}
+        z = np.nan_to_num
+        charge = cube[k[CCR_CHARGE]]
+        cost = sum(z(cube[k[m]]) for m in CCR_COST)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ccr = np.where(np.isnan(charge) | (charge == 0), np.nan, cost / charge)
+        sp.set(cube=list(cube.shape))
+
+    n_rows, n_lines = len(key_frame), len(lines)
+    year_end = key_frame["YEAR_END"].to_numpy()
+    # shared between scenarios that use the same columns
+    reported: dict[tuple, np.ndarray] = {}
+    payer_costs: dict[tuple, np.ndarray] = {}
+
+    results = []
+    for s in scenarios:
+        with span(f"scenario:{s.name}") as sp:
+            ms = tuple(s.measures)
+            if ms not in reported:
+                # rows of compute_calc(): at least one of the scenario's measures reported
+                reported[ms] = (~np.isnan(cube[[k[m] for m in ms]])).any(axis=0)
+            in_years = (year_end >= s.years[0]) & (year_end <= s.years[1])
+            keep = (reported[ms] & in_years[:, None]).ravel()
+            row_idx = np.repeat(np.arange(n_rows), n_lines)[keep]
+
+            calc = key_frame.iloc[row_idx].reset_index(drop=True)
+            calc["revenue_center"] = pd.array(np.tile(lines, n_rows)[keep], dtype="Int64")
+            calc["cost_to_charge_ratio"] = ccr.ravel()[keep]
+            for payer, cols in s.payers.items():
+                cols = tuple(cols)
+                if cols not in payer_costs:
+                    payer_costs[cols] = sum(z(cube[k[m]]) for m in cols) * ccr
+                calc[payer] = payer_costs[cols].ravel()[keep]
+
+            calc = drop_empty_revenue_centers(calc, s.max_revenue_center)
+            totals = facility_totals(calc, costs={p: p for p in s.payers})
+            long = (
+                totals.set_index(KEYS)
+                .rename_axis(columns="payer")
+                .stack()
+                .rename("total_cost")
+                .reset_index()
+            )
+            long.insert(0, "scenario", s.name)
+            results.append(long)
+            sp.rows_out(long)
+
+    out = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=RESULT_COLUMNS)
+    return out[RESULT_COLUMNS].astype({"scenario": "string", "payer": "string"})
+
+
+def summarize(result: pd.DataFrame) -> pd.DataFrame:
+    """Facility-years, median and total cost per scenario and payer."""
+    g = result.groupby(["scenario", "payer"], sort=False)["total_cost"]
+    return g.agg(facility_years="count", median="median", total="sum").reset_index()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Jan 26 14:07:55 2026
+
+@author: eloaeza
+
+On-disk cache for benchmark pipeline stages.
+
+Each stage output is stored as parquet under
+
+    <root>/<stage>/<key>.parquet   (+ <key>.json with what went into the key)
+
+where the key hashes the stage's inputs: file fingerprints (path, size,
+mtime), parameters (PAIRS, EXTRA_PCLS, year window, ...), the keys of the
+upstream stages it consumed, and the source of the code that computes it.
+Change any of those and the key changes, so downstream stages miss too;
+edit only the CCR code and only the CCR-and-later stages recompute.
+
+Old entries are evicted by age and then least-recently-used until the
+cache fits in max_bytes.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from types import ModuleType
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+DEFAULT_MAX_BYTES = 5 * 1024**3
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+def file_fingerprint(path: Path) -> list:
+    """(path, size, mtime_ns) for a file, or for every file under a directory."""
+    path = Path(path)
+    if path.is_dir():
+        return [
+            [str(p.relative_to(path)), p.stat().st_size, p.stat().st_mtime_ns]
+            for p in sorted(path.rglob("*")) if p.is_file()
+        ]
+    if not path.exists():
+        return [str(path), None, None]
+    st = path.stat()
+    return [str(path), st.st_size, st.st_mtime_ns]
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while chunk := fh.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def code_fingerprint(*modules: ModuleType) -> str:
+    h = hashlib.sha256()
+    for m in modules:
+        h.update(Path(m.__file__).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def _normalize(x):
+    # json-stable view of key parts (sets sorted, tuples as lists, paths as str)
+    if isinstance(x, dict):
+        return {str(k): _normalize(v) for k, v in sorted(x.items())}
+    if isinstance(x, (set, frozenset)):
+        return sorted(_normalize(v) for v in x)
+    if isinstance(x, (list, tuple)):
+        return [_normalize(v) for v in x]
+    if isinstance(x, Path):
+        return str(x)
+    return x
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    # release the Arrow buffers as they are converted, so the wide frames
+    # are not held twice
+    return table.to_pandas(self_destruct=True)
+
+
+def write_parquet(data: pd.DataFrame | pa.Table, path: Path) -> None:
+    if isinstance(data, pa.Table):
+        pq.write_table(data, path)
+    else:
+        data.to_parquet(path, index=False)
+
+
+def stage_key(stage: str, parts: dict) -> str:
+    blob = json.dumps({"stage": stage, **_normalize(parts)}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()[:24]
+
+
+class StageCache:
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int | None = DEFAULT_MAX_BYTES,
+        max_age_days: float | None = DEFAULT_MAX_AGE_DAYS,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+    def path(self, stage: str, key: str) -> Path:
+        return self.root / stage / f"{key}.parquet"
+
+    def get(self, stage: str, key: str) -> pd.DataFrame | None:
+        path = self.path(stage, key)
+        if not path.exists():
+            return None
+        df = to_pandas(pq.read_table(path))
+        # mtime doubles as "last used" for LRU eviction
+        path.touch()
+        return df
+
+    def put(self, stage: str, key: str, df: pd.DataFrame | pa.Table, parts: dict | None = None) -> Path:
+        path = self.path(stage, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".parquet.tmp")
+        write_parquet(df, tmp)
+        tmp.replace(path)
+        path.with_suffix(".json").write_text(
+            json.dumps(
+                {"stage": stage, "key": key, "created": time.time(), "parts": _normalize(parts or {})},
+                indent=2, default=str,
+            )
+        )
+        self.evict()
+        return path
+
+    def entries(self) -> list[Path]:
+        return list(self.root.glob("*/*.parquet"))
+
+    def evict(self) -> list[Path]:
+        """Drop entries older than max_age_days, then LRU until under max_bytes."""
+        now = time.time()
+        removed = []
+        entries = sorted(self.entries(), key=lambda p: p.stat().st_mtime)
+
+        def drop(p):
+            p.unlink(missing_ok=True)
+            p.with_suffix(".json").unlink(missing_ok=True)
+            removed.append(p)
+
+        if self.max_age_days is not None:
+            cutoff = now - self.max_age_days * 86400
+            for p in [p for p in entries if p.stat().st_mtime < cutoff]:
+                drop(p)
+                entries.remove(p)
+
+        if self.max_bytes is not None:
+            total = sum(p.stat().st_size for p in entries)
+            # never evict the newest entry (the one just written)
+            for p in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                total -= p.stat().st_size
+                drop(p)
+
+        return removed
@@ -8,65 +8,57 @@ Created on Sun Jan 18 09:07:14 2026
 
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
+import os
 import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from collections import Counter
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ingest_types import (
+    column_kinds,
+    load_column_types,
+    normalize_cell,
+    typed_table,
+    write_coercion_report,
+)
+from catalog import build_catalog, catalog_path, open_catalog
+from instrument import PROFILERS, RunReport, recording, span
+from instrument import active as active_report
+from pcl_header import pcl_columns
+from pcl_store import build_long_store, long_dir
+from stage_cache import file_sha256
+from xlsx_reader import READERS, open_sheet, resolve_reader
 
 
 DATA_DIR = Path("/Users/eloaeza/projects/hadr-project/data_raw/")
 OUT_DIR  = Path("/Users/eloaeza/projects/hadr-project/outputs/out_step1_single_sheet/")
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-SHEET_NAME = "Financial and Utilization Data"   # change to "Cost Allocation Data" if needed
-
-
-def pcl_token(x) -> str:
-    if pd.isna(x):
-        return ""
-    try:
-        f = float(x)
-        if f.is_integer():
-            return str(int(f))
-        return f"{f:.10f}".rstrip("0").rstrip(".")   # keeps 4.1 as "4.1"
-    except Exception:
-        return str(x).strip()
-
-
-def build_pcl_column_ids(header4: pd.DataFrame) -> list[str]:
-    page_row = header4.iloc[0].tolist()
-    col_row  = header4.iloc[1].tolist()
-    line_row = header4.iloc[2].tolist()
-
-    out = []
-    for j in range(len(page_row)):
-        if j == 0:
-            out.append("OSHPD_FACILITY_NUMBER"); continue
-        if j == 1:
-            out.append("REPORT_PERIOD_END_DATE"); continue
-
-        p, c, l = page_row[j], col_row[j], line_row[j]
-        if pd.isna(p) or pd.isna(c) or pd.isna(l):
-            out.append(f"COL_{j:05d}")
-            continue
 
-        p_s, c_s, l_s = pcl_token(p), pcl_token(c), pcl_token(l)
-        if not (p_s and c_s and l_s):
-            out.append(f"COL_{j:05d}")
-            continue
+# output file prefix -> workbook sheet
+SHEETS = {
+    "fin_util": "Financial and Utilization Data",
+    "cost_alloc": "Cost Allocation Data",
+}
 
-        out.append(f"P{p_s}_C{c_s}_L{l_s}")
-    return out
+# rows per parquet row group in streaming mode
+BATCH_ROWS = 256
 
+# typed streaming: rows buffered before the column types are fixed
+INFER_ROWS = 1000
 
-def make_unique(cols: list[str]) -> list[str]:
-    seen = Counter()
-    out = []
-    for c in cols:
-        seen[c] += 1
-        out.append(c if seen[c] == 1 else f"{c}__dup{seen[c]:03d}")
-    return out
+# appended dataset: rows per row group within a DISCLOSURE_CYCLE partition.
+# A cycle is a few hundred hospitals by thousands of PCL columns, so a small
+# row group keeps per-facility min/max stats useful without exploding the
+# footer (one column chunk per column per row group). Written with pyarrow:
+# DuckDB's COPY rounds ROW_GROUP_SIZE up to its 2048-row vectors.
+APPEND_ROW_GROUP_ROWS = 128
+APPEND_COMPRESSION = "zstd"
 
 
 def disclosure_cycle_from_name(path: Path) -> int:
@@ -77,81 +69,517 @@ def disclosure_cycle_from_name(path: Path) -> int:
     return int(m.group(1))
 
 
-def process_file(xlsx_path: Path, sheet_name: str, out_dir: Path) -> Path:
+def report_coercion(errors: list[dict], out_parquet: Path) -> None:
+    out_csv = out_parquet.with_name(f"{out_parquet.stem}_coercion_errors.csv")
+    if write_coercion_report(errors, out_csv):
+        print(f"{len(errors)} cells did not match their column type, see {out_csv}")
+
+
+def process_file(
+    xlsx_path: Path,
+    sheet_name: str,
+    out_dir: Path,
+    prefix: str = "fin_util",
+    typed: bool = True,
+    column_types: dict[str, str] | None = None,
+    reader: str = "auto",
+) -> Path:
     dc = disclosure_cycle_from_name(xlsx_path)
-    out_parquet = out_dir / f"fin_util_{dc}.parquet"
-
-    # metadata rows
-    header4 = pd.read_excel(
-        xlsx_path,
-        sheet_name=sheet_name,
-        header=None,
-        nrows=4,
-        engine="openpyxl",
-    )
+    out_parquet = out_dir / f"{prefix}_{dc}.parquet"
 
-    cols = build_pcl_column_ids(header4)
-    cols_u = make_unique(cols)
-
-    # full data (remove nrows=... for full sheet)
-    df = pd.read_excel(
-        xlsx_path,
-        sheet_name=sheet_name,
-        header=None,
-        skiprows=4,
-        engine="openpyxl",
-        dtype=object,
-    )
+    with open_sheet(xlsx_path, sheet_name, reader) as (_, rows):
+        # metadata rows
+        header4 = pd.DataFrame([next(rows, ()) for _ in range(4)], dtype=object)
+        data = list(rows)
 
-    # align column count defensively (in case of occasional mismatch)
-    m = min(df.shape[1], len(cols_u))
-    df = df.iloc[:, :m]
-    df.columns = cols_u[:m]
+    cols_u = pcl_columns(header4)
+    if not cols_u:
+        print(f"{xlsx_path.name} [{sheet_name}]: no columns in the header, writing DISCLOSURE_CYCLE only")
 
-    df.insert(0, "DISCLOSURE_CYCLE", dc)
+    # one column per header PCL: the readers drop trailing empty cells, so
+    # short rows (and all-empty trailing columns) are padded with nulls
+    columns = rows_to_columns(data, len(cols_u))
 
-    # pyarrow-safe: normalize all object cols to pandas string
-    obj_cols = df.select_dtypes(include=["object"]).columns
-    df[obj_cols] = df[obj_cols].astype("string")
+    if not typed:
+        pq.write_table(string_table(cols_u, columns, dc), out_parquet)
+        return out_parquet
 
-    df.to_parquet(out_parquet, index=False, engine="pyarrow")
+    kinds = column_kinds(cols_u, columns, column_types)
+    table, errors = typed_table(cols_u, columns, dc, kinds)
+    pq.write_table(table, out_parquet)
+    report_coercion(errors, out_parquet)
     return out_parquet
 
 
-def main():
-    files = sorted(DATA_DIR.glob("4[1-9]hospitaldata.xlsx"))
-    if not files:
-        raise FileNotFoundError(f"No files found in {DATA_DIR}")
+def rows_to_columns(rows: list[tuple], width: int) -> list[list]:
+    columns = [[None] * len(rows) for _ in range(width)]
+    for i, row in enumerate(rows):
+        for j, v in enumerate(row[:width]):
+            columns[j][i] = normalize_cell(v)
+    return columns
+
+
+def string_table(names: list[str], columns: list[list], dc: int) -> pa.Table:
+    n = len(columns[0]) if columns else 0
+    arrays = [pa.array([dc] * n, type=pa.int64())]
+    arrays += [
+        pa.array([None if v is None else str(v) for v in col], type=pa.string())
+        for col in columns
+    ]
+    return pa.Table.from_arrays(arrays, names=["DISCLOSURE_CYCLE"] + names)
+
+
+def process_file_streaming(
+    xlsx_path: Path,
+    sheet_name: str,
+    out_dir: Path,
+    batch_rows: int = BATCH_ROWS,
+    prefix: str = "fin_util",
+    typed: bool = True,
+    column_types: dict[str, str] | None = None,
+    reader: str = "auto",
+) -> Path:
+    """
+    Same output as process_file, but writes one parquet row group per
+    `batch_rows` rows as they are read, so memory is bounded by batch_rows x
+    sheet width instead of the sheet (with the xml and openpyxl readers;
+    calamine holds the sheet itself).
+
+    With typed=True the column types are inferred from the first
+    max(batch_rows, INFER_ROWS) rows and then held fixed; later cells that
+    do not fit are nulled and reported.
+    """
+    dc = disclosure_cycle_from_name(xlsx_path)
+    out_parquet = out_dir / f"{prefix}_{dc}.parquet"
+
+    with open_sheet(xlsx_path, sheet_name, reader) as (_, rows):
+        # metadata rows
+        header4 = pd.DataFrame([next(rows, ()) for _ in range(4)], dtype=object)
+        cols_u = pcl_columns(header4)
+        if not cols_u:
+            print(f"{xlsx_path.name} [{sheet_name}]: no columns in the header, writing DISCLOSURE_CYCLE only")
+
+        writer = None
+        kinds = None
+        errors: list[dict] = []
+        n_written = 0
+
+        def flush(batch):
+            nonlocal writer, kinds, n_written
+            columns = rows_to_columns(batch, len(cols_u))
+            if not typed:
+                table = string_table(cols_u, columns, dc)
+            else:
+                if kinds is None:
+                    kinds = column_kinds(cols_u, columns, column_types)
+                table, errs = typed_table(cols_u, columns, dc, kinds, n_written)
+                errors.extend(errs)
+            if writer is None:
+                writer = pq.ParquetWriter(out_parquet, table.schema)
+            writer.write_table(table)
+            n_written += len(batch)
+
+        try:
+            batch: list[tuple] = []
+            first_batch = max(batch_rows, INFER_ROWS) if typed else batch_rows
+            # open_sheet drops trailing blank rows, like read_excel
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= (batch_rows if writer else first_batch):
+                    flush(batch)
+                    batch = []
+            if batch or writer is None:
+                flush(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    if typed:
+        report_coercion(errors, out_parquet)
+    return out_parquet
+
+
+def ingest_one(
+    xlsx_path: Path,
+    prefix: str,
+    out_dir: Path,
+    streaming: bool = False,
+    batch_rows: int = BATCH_ROWS,
+    typed: bool = True,
+    column_types: dict[str, str] | None = None,
+    reader: str = "auto",
+    profile: dict | None = None,
+) -> tuple[Path, float, dict]:
+    # one (workbook, sheet) unit of work; module-level so it pickles into
+    # workers. The span is returned rather than recorded so it comes back
+    # from worker processes too; `profile` carries RunReport's profile_* options
+    local = RunReport("ingest", **(profile or {}))
+    reader = resolve_reader(reader)
+    with local.span(f"parse:{xlsx_path.name}", sheet=prefix, streaming=streaming, reader=reader) as s:
+        if streaming:
+            out = process_file_streaming(
+                xlsx_path, SHEETS[prefix], out_dir, batch_rows, prefix, typed, column_types, reader
+            )
+        else:
+            out = process_file(xlsx_path, SHEETS[prefix], out_dir, prefix, typed, column_types, reader)
+        s.rows_out(out).set(bytes_out=out.stat().st_size)
+    result = local.spans[0]
+    return out, result["secs"], result
+
+
+def ingest_files(
+    tasks: list[tuple[Path, str]],
+    out_dir: Path,
+    workers: int = 1,
+    streaming: bool = False,
+    batch_rows: int = BATCH_ROWS,
+    typed: bool = True,
+    column_types: dict[str, str] | None = None,
+    reader: str = "auto",
+) -> list[Path]:
+    """
+    Convert each (workbook, prefix) task, fanning out over `workers`
+    processes. Each task writes its own {prefix}_{dc}.parquet, so the files
+    do not depend on scheduling; the returned list is in task order.
+    """
+    outs: dict[tuple[Path, str], Path] = {}
+    run = active_report()
+    profile = None
+    if run is not None and run.profile_stage:
+        profile = {
+            "profile_stage": run.profile_stage,
+            "profiler": run.profiler,
+            "profile_dir": run.profile_dir,
+        }
+    opts = (out_dir, streaming, batch_rows, typed, column_types, reader, profile)
+
+    def report(task, out, secs, task_span):
+        outs[task] = out
+        if run is not None:
+            run.add(task_span)
+        print(f"Wrote: {out} size: {out.stat().st_size} ({task[0].name} [{task[1]}] {secs:.1f}s)")
+
+    if workers <= 1:
+        for task in tasks:
+            report(task, *ingest_one(*task, *opts))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(ingest_one, *task, *opts): task
+                for task in tasks
+            }
+            for fut in as_completed(futures):
+                report(futures[fut], *fut.result())
+
+    return [outs[task] for task in tasks]
+
+
+def manifest_path(out_dir: Path) -> Path:
+    # lives next to OUT_DIR, not inside it, so parquet globs never see it
+    return out_dir.parent / f"{out_dir.name}_manifest.json"
+
+
+def load_manifest(path: Path) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_manifest(path: Path, manifest: dict[str, dict]) -> None:
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp.replace(path)
+
+
+def schema_fingerprint(parquet_path: Path) -> str:
+    schema = pq.read_schema(parquet_path)
+    desc = "\n".join(f"{f.name}:{f.type}" for f in schema)
+    return hashlib.sha256(desc.encode()).hexdigest()[:16]
+
+
+def manifest_key(xlsx_path: Path, prefix: str) -> str:
+    return f"{xlsx_path.name}::{prefix}"
+
+
+def plan_ingest(
+    files: list[Path],
+    prefixes: list[str],
+    manifest: dict[str, dict],
+    force: bool = False,
+    options: dict | None = None,
+) -> tuple[list[tuple[Path, str]], dict[str, set[int]], dict[Path, tuple]]:
+    """
+    Decide which (workbook, prefix) tasks need re-ingesting.
+
+    A task is skipped when its manifest entry matches the workbook and its
+    output still exists. Size + mtime is the fast path; if either moved, the
+    content hash decides (a touched-but-identical file is not rebuilt).
+    Changing ingest `options` (e.g. typing) invalidates every entry.
+    Entries for workbooks that disappeared are dropped along with their
+    parquet. Returns the tasks to run, per prefix the disclosure cycles
+    whose appended partition is stale, and the (size, mtime, sha256) of
+    the workbooks it hashed, for record_ingest().
+    """
+    tasks = []
+    stale: dict[str, set[int]] = {}
+    digests: dict[Path, tuple] = {}
+    seen = set()
 
     for f in files:
-        out = process_file(f, SHEET_NAME, OUT_DIR)
-        print("Wrote:", out, "size:", out.stat().st_size)
+        st = f.stat()
+        digest = None
+        for prefix in prefixes:
+            key = manifest_key(f, prefix)
+            seen.add(key)
+            entry = manifest.get(key)
+            if (
+                not force
+                and entry
+                and entry.get("options") == options
+                and Path(entry["output"]).exists()
+            ):
+                if entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+                    continue
+                if digest is None:
+                    digest = file_sha256(f)
+                    digests[f] = (st.st_size, st.st_mtime, digest)
+                if entry["sha256"] == digest:
+                    entry.update(size=st.st_size, mtime=st.st_mtime)
+                    continue
+            tasks.append((f, prefix))
+            stale.setdefault(prefix, set()).add(disclosure_cycle_from_name(f))
+
+    for key in [k for k in manifest if k not in seen]:
+        name, prefix = key.split("::", 1)
+        if prefix not in prefixes:
+            continue
+        Path(manifest.pop(key)["output"]).unlink(missing_ok=True)
+        stale.setdefault(prefix, set()).add(disclosure_cycle_from_name(Path(name)))
 
+    return tasks, stale, digests
 
-if __name__ == "__main__":
-    main()
 
+def record_ingest(
+    manifest: dict[str, dict],
+    tasks: list[tuple[Path, str]],
+    outs: list[Path],
+    options: dict | None = None,
+    digests: dict[Path, tuple] | None = None,
+) -> None:
+    """
+    Manifest entries for the ingested tasks. A workbook is hashed only if
+    plan_ingest() did not already hash it at its current size and mtime.
+    """
+    digests = {} if digests is None else digests
+    for (f, prefix), out in zip(tasks, outs):
+        st = f.stat()
+        known = digests.get(f)
+        if known is None or known[:2] != (st.st_size, st.st_mtime):
+            known = digests[f] = (st.st_size, st.st_mtime, file_sha256(f))
+        manifest[manifest_key(f, prefix)] = {
+            "path": str(f),
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "sha256": known[2],
+            "sheet": SHEETS[prefix],
+            "output": str(out),
+            "schema": schema_fingerprint(out),
+            "options": options,
+        }
+
+
+def appended_dir(out_dir: Path, prefix: str = "fin_util") -> Path:
+    return out_dir / f"{prefix}_appended"
+
+
+def append_partitioned(
+    out_dir: Path,
+    prefix: str = "fin_util",
+    cycles: set[int] | None = None,
+) -> Path:
+    """
+    Append the per-cycle files into a hive-partitioned dataset
 
+        {prefix}_appended/DISCLOSURE_CYCLE={dc}/data_0.parquet
 
-# Append all files in a single parquet file
-import duckdb
+    with rows sorted by OSHPD_FACILITY_NUMBER inside each partition, so a
+    year/cycle filter only opens the matching directories and a facility
+    filter can skip row groups by their min/max stats.
 
-FINAL_PARQUET = OUT_DIR / "fin_util_appended.parquet"
+    Only partitions in `cycles` (or missing ones) are rewritten; partitions
+    whose per-cycle file is gone are removed. cycles=None rewrites all.
+    """
+    root = appended_dir(out_dir, prefix)
+    root.mkdir(parents=True, exist_ok=True)
 
-con = duckdb.connect()
-con.execute(
-    f"""
-    COPY (
-        SELECT * FROM read_parquet('{OUT_DIR.as_posix()}/fin_util_*.parquet')
+    sources = {
+        disclosure_cycle_from_name(p): p
+        for p in out_dir.glob(f"{prefix}_[0-9]*.parquet")
+    }
+
+    for part in root.glob("DISCLOSURE_CYCLE=*"):
+        if int(part.name.split("=", 1)[1]) not in sources:
+            shutil.rmtree(part)
+
+    for dc, src in sorted(sources.items()):
+        part = root / f"DISCLOSURE_CYCLE={dc}"
+        if part.exists() and cycles is not None and dc not in cycles:
+            continue
+        if part.exists():
+            shutil.rmtree(part)
+        with span(f"copy {dc}") as sp:
+            # the cycle lives in the directory name; stable sort keeps the
+            # workbook order of a facility's reports
+            table = pq.read_table(src)
+            if "DISCLOSURE_CYCLE" in table.column_names:
+                table = table.drop_columns(["DISCLOSURE_CYCLE"])
+            if "OSHPD_FACILITY_NUMBER" not in table.column_names:
+                # a sheet without columns; there is nothing to partition
+                print(f"Skipped partition: {src.name} has no facility column")
+                continue
+            table = table.sort_by("OSHPD_FACILITY_NUMBER")
+            part.mkdir(parents=True)
+            pq.write_table(
+                table,
+                part / "data_0.parquet",
+                row_group_size=APPEND_ROW_GROUP_ROWS,
+                compression=APPEND_COMPRESSION,
+            )
+            sp.rows_out(table)
+        print("Wrote partition:", part)
+
+    print("Final appended dataset:", root)
+    return root
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Convert HADR workbooks to per-cycle parquet.")
+    ap.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    ap.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    ap.add_argument(
+        "--sheets", nargs="+", choices=list(SHEETS), default=["fin_util"],
+        help="which workbook sheets to convert (by output prefix)",
     )
-    TO '{FINAL_PARQUET.as_posix()}'
-    (FORMAT PARQUET);
-    """
-)
-con.close()
+    ap.add_argument(
+        "--workers", type=int, default=1,
+        help="worker processes for parallel ingest (0 = one per CPU)",
+    )
+    ap.add_argument(
+        "--streaming", action="store_true",
+        help="read each workbook once in read-only mode and write row groups incrementally",
+    )
+    ap.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    ap.add_argument(
+        "--reader", choices=["auto", *READERS], default="auto",
+        help="xlsx reader backend (auto: calamine if installed, else the streaming xml parser)",
+    )
+    ap.add_argument(
+        "--untyped", action="store_true",
+        help="write every PCL column as text (the pre-typing layout)",
+    )
+    ap.add_argument(
+        "--column-types", type=Path,
+        help="csv with pcl,type columns forcing int64/float64/date/string per PCL",
+    )
+    ap.add_argument(
+        "--long", action="store_true",
+        help="also write the long (cycle, facility, page, col, line, value) store; "
+             "an existing long store is always kept up to date",
+    )
+    ap.add_argument(
+        "--catalog", action="store_true",
+        help=f"build / refresh the DuckDB catalog ({catalog_path(Path('<out-dir>'))}); "
+             "an existing catalog is always kept up to date",
+    )
+    ap.add_argument(
+        "--force", action="store_true",
+        help="ignore the manifest and re-ingest every workbook",
+    )
+    add_report_args(ap)
+    return ap.parse_args(argv)
+
+
+def add_report_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--report", type=Path, help="write a JSON run report (timings, rows, memory) here")
+    ap.add_argument(
+        "--profile-stage",
+        help="run this span under a profiler, e.g. 'ingest' or 'parse:41hospitaldata.xlsx'",
+    )
+    ap.add_argument("--profiler", choices=PROFILERS, default="cprofile")
+
+
+def report_from_args(name: str, args: argparse.Namespace, meta: dict | None = None) -> RunReport | None:
+    if not (args.report or args.profile_stage):
+        return None
+    profile_dir = args.report.parent if args.report else Path(".")
+    return RunReport(name, meta, args.profile_stage, args.profiler, profile_dir)
 
-print("Final appended file:", FINAL_PARQUET)
 
+def main(argv=None):
+    args = parse_args(argv)
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    report = report_from_args("ingest", args, {"data_dir": args.data_dir, "out_dir": args.out_dir})
 
+    with recording(report):
+        ingest(args)
 
+    if report is not None and args.report:
+        report.write(args.report)
 
+
+def ingest(args: argparse.Namespace) -> None:
+    files = sorted(args.data_dir.glob("4[1-9]hospitaldata.xlsx"))
+    if not files:
+        raise FileNotFoundError(f"No files found in {args.data_dir}")
+
+    typed = not args.untyped
+    column_types = load_column_types(args.column_types) if args.column_types else None
+    options = {"typed": typed, "column_types": column_types}
+
+    with span("plan") as s:
+        mpath = manifest_path(args.out_dir)
+        manifest = load_manifest(mpath)
+        tasks, stale, digests = plan_ingest(files, args.sheets, manifest, args.force, options)
+        s.set(workbooks=len(files), tasks=len(tasks))
+    print(f"{len(tasks)} of {len(files) * len(args.sheets)} workbook sheets to ingest")
+
+    workers = args.workers or os.cpu_count() or 1
+    with span("ingest", workers=workers, streaming=args.streaming, reader=resolve_reader(args.reader)):
+        outs = ingest_files(
+            tasks, args.out_dir,
+            workers=workers, streaming=args.streaming, batch_rows=args.batch_rows,
+            typed=typed, column_types=column_types, reader=args.reader,
+        )
+    record_ingest(manifest, tasks, outs, options, digests)
+    save_manifest(mpath, manifest)
+
+    for prefix in args.sheets:
+        with span(f"append:{prefix}", cycles=sorted(stale.get(prefix, set()))):
+            append_partitioned(args.out_dir, prefix, stale.get(prefix, set()))
+        # an existing long store is kept in step with the wide files
+        if args.long or long_dir(args.out_dir, prefix).exists():
+            with span(f"long:{prefix}"):
+                build_long_store(args.out_dir, prefix, stale.get(prefix, set()))
+
+    if "fin_util" in args.sheets and (args.catalog or catalog_path(args.out_dir).exists()):
+        refresh_catalog(args.out_dir, force=args.force)
+
+
+def refresh_catalog(out_dir: Path, prefix: str = "fin_util", force: bool = False) -> None:
+    """Rebuild the catalog entries for `prefix` unless they match the appended files."""
+    from step_2_create_df import EXTRA_PCLS, PAIRS
+
+    appended = appended_dir(out_dir, prefix)
+    catalog = catalog_path(out_dir)
+    if not force:
+        con = open_catalog(catalog, prefix, appended, PAIRS, EXTRA_PCLS)
+        if con is not None:
+            con.close()
+            print("Catalog is current:", catalog)
+            return
+    with span(f"catalog:{prefix}"):
+        build_catalog(out_dir, prefix, appended, PAIRS, EXTRA_PCLS, catalog)
+
+
+if __name__ == "__main__":
+    main()
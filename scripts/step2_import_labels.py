@@ -6,104 +6,39 @@ Created on Sun Jan 18 12:04:15 2026
 @author: eloaeza
 """
 
-import re
-import pandas as pd
 from pathlib import Path
 
-######## Get columns labels
-PCL_LABELS_XLSX = Path("/Users/eloaeza/projects/hadr-project/data_raw/hadrfull-db-pcl-labels-2015-20xx.xlsx")
-
-def pcl_token(x) -> str:
-    if pd.isna(x):
-        return ""
-    try:
-        f = float(x)
-        if f.is_integer():
-            return str(int(f))
-        return f"{f:.10f}".rstrip("0").rstrip(".")  # keeps 3.3, 4.1, etc.
-    except Exception:
-        return str(x).strip()
-
-def sanitize(s: str) -> str:
-    s = str(s).strip()
-    s = re.sub(r"[^\w]+", "_", s)
-    s = re.sub(r"_+", "_", s).strip("_")
-    return s[:120]
-
-def load_pcl_labels_split_canon(labels_xlsx: Path) -> dict[str, dict[str, str]]:
-    df = pd.read_excel(labels_xlsx, sheet_name="HADR", engine="openpyxl")
-
-    # Build canonical PCL using Page/Col/Line (preserves decimals)
-    df["PCL_CANON"] = (
-        "P" + df["Page"].map(pcl_token)
-        + "_C" + df["Col"].map(pcl_token)
-        + "_L" + df["Line"].map(pcl_token)
-    )
-
-    ws = df["Worksheet 1 / 2"].astype("object")
-    fin = df[ws.isna()]
-    ca  = df[ws.astype(str).str.strip().eq("Cost Alloc")]
-
-    def make_map(sub: pd.DataFrame) -> dict[str, str]:
-        m = {}
-        for pcl, desc in zip(sub["PCL_CANON"], sub["Data File Description"]):
-            if isinstance(pcl, str) and pcl.startswith("P") and pd.notna(desc) and str(desc).strip():
-                m[pcl] = sanitize(desc)
-        return m
+import pandas as pd
 
-    return {
-        "financial_utilization": make_map(fin),
-        "cost_allocation": make_map(ca),
-    }
+from pcl_labels import CACHE_DIR, pcl_label_index
 
+######## Get columns labels
+PCL_LABELS_XLSX = Path("/Users/eloaeza/projects/hadr-project/data_raw/hadrfull-db-pcl-labels-2015-20xx.xlsx")
 
-# Step 1 — Load canonical label maps
-maps = load_pcl_labels_split_canon(PCL_LABELS_XLSX)
-maps["financial_utilization"].get("P3.3_C5_L40")
 
+def revenue_centers(index, prefix: str, pattern: str = r"^REV_IP_MCARE_MC_(.+)$") -> pd.DataFrame:
+    """pcl / label of every line under `prefix`, plus the revenue center text."""
+    df = index.frame(prefix)
+    df["revenue_center"] = df["label"].str.extract(pattern)[0]
+    return df
 
-fin_pcl_to_label = maps["financial_utilization"]
 
-maps = load_pcl_labels_split_canon(PCL_LABELS_XLSX)
-fin_p2l = maps["financial_utilization"]
+# Step 1 — Load the compiled label index (cached per workbook)
+labels = pcl_label_index(PCL_LABELS_XLSX, CACHE_DIR)
+labels.label("P3.3_C5_L40")
 
+fin_pcl_to_label = labels.labels("financial_utilization")
 
 
 # keep only P10_C11 variables
-p10_c11_dict = {
-    k: v
-    for k, v in fin_pcl_to_label.items()
-    if k.startswith("P10_C11_")
-}
-
-# view as a DataFrame (nice for inspection/export)
-rev_center_dict = (
-    pd.DataFrame.from_dict(fin_pcl_to_label, orient="index", columns=["label"])
-    .reset_index(names="pcl")
-    .query("pcl.str.startswith('P12_C3_')", engine="python")
-)
-
-# extract revenue center text after 'SUMM_GR_REV_'
-rev_center_dict["revenue_center"] = (
-    rev_center_dict["label"]
-    .str.extract(r"^REV_IP_MCARE_MC_(.+)$")[0]
-)
+p10_c11_dict = labels.prefix("P10_C11")
 
-rev_center_dict
+# extract revenue center text after 'REV_IP_MCARE_MC_'
+rev_center_dict = revenue_centers(labels, "P12_C3")
 
+rev_center_dict
 
-# view as a DataFrame (nice for inspection/export)
-rev_center_dict = (
-    pd.DataFrame.from_dict(fin_pcl_to_label, orient="index", columns=["label"])
-    .reset_index(names="pcl")
-    .query("pcl.str.startswith('P12_C2_')", engine="python")
-)
 
-# extract revenue center text after 'SUMM_GR_REV_'
-rev_center_dict["revenue_center"] = (
-    rev_center_dict["label"]
-    .str.extract(r"^REV_IP_MCARE_MC_(.+)$")[0]
-)
+rev_center_dict = revenue_centers(labels, "P12_C2")
 
 rev_center_dict
-
@@ -4,86 +4,75 @@
 Created on Sun Jan 18 09:34:14 2026
 
 @author: eloaeza
-"""
-import re
-import pandas as pd
-from pathlib import Path
-import pdfplumber
-import duckdb
-
-# Get ids for HOSPITALS THAT SUBMIT NON-COMPARABLE REPORTS
-PDF = Path("/Users/eloaeza/projects/hadr-project/data_raw/hadrfull-db-documentation-rpe2015-xx.pdf")  # adjust if needed
 
-# PDF pages are 0-indexed: page 8 -> index 7, page 9 -> index 8
-PAGE_IDXS = [7, 8]
+Benchmark pipeline: non-comparable exclusions, case mix, measure selection,
+facility-year dedupe, cost-to-charge ratios and payer cost totals.
 
-ids = []
-with pdfplumber.open(PDF) as pdf:
-    for i in PAGE_IDXS:
-        txt = pdf.pages[i].extract_text() or ""
-        ids.extend(re.findall(r"\b\d{9}\b", txt))
-
-exclude_ids = sorted(set(ids))
-
-print("n exclude IDs:", len(exclude_ids))
-print(exclude_ids[:10])
-
-# optional: save for later joins/filters
-df_exclude = pd.DataFrame({"OSHPD_FACILITY_NUMBER": exclude_ids})
-out = Path("/Users/eloaeza/projects/hadr-project/outputs/non_comparable_2015_ids.csv")
-out.parent.mkdir(parents=True, exist_ok=True)
-df_exclude.to_csv(out, index=False)
-print("wrote:", out)
+Every stage is a function with explicit inputs and outputs; run_pipeline()
+wires them together, reuses unchanged stages from the stage cache
+(stage_cache.py) and saves each stage's output under
+`<out_dir>/benchmark_stages/` (see hadr_benchmark.py for the CLI).
+"""
+from __future__ import annotations
 
-#########
-# Import case mix data by hospital and year
+import shutil
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
 
-# read the file
-df = pd.read_excel(
-    "/Users/eloaeza/projects/hadr-project/data_raw/case-mix-index-d6t7du37/case-mix-index-1996-2024.xlsx",
-    dtype={"oshpd_id": "string"}  # or "object"
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+import benchmark_engine
+import best_report
+import case_mix as case_mix_module
+import catalog as catalog_module
+import exclusions
+import reconcile as reconcile_module
+from benchmark_engine import (
+    ccr_summary,
+    compute_calc,
+    drop_empty_revenue_centers,
+    facility_totals,
 )
-
-ID_COLS = ["county", "oshpd_id", "hospital"]
-
-# identify value columns (FYxxxx or CYxxxx)
-value_cols = [c for c in df.columns if re.match(r"^(FY|CY)\d{4}$", str(c))]
-
-# reshape to long
-df_long = df.melt(
-    id_vars=ID_COLS,
-    value_vars=value_cols,
-    var_name="period",
-    value_name="case_mix_index",
+from best_report import best_reports
+from catalog import (
+    DERIVED,
+    LEADING,
+    ROW_ORDER,
+    catalog_columns,
+    catalog_path,
+    measure_columns,
+    open_catalog,
+    parquet_scan,
+    selection_sql,
+)
+from cost_cube import cube_source, write_cost_cube
+from case_mix import CaseMixIndex, case_mix_store
+from exclusions import non_comparable_ids
+from instrument import duckdb_profile, span
+from reconcile import (
+    ATOL,
+    PUBLISHED_COLUMNS,
+    RTOL,
+    load_published,
+    measures_of,
+    missing_columns,
+    reconcile,
+)
+from stage_cache import (
+    StageCache,
+    code_fingerprint,
+    file_fingerprint,
+    stage_key,
+    to_pandas,
+    write_parquet,
 )
 
-# extract type (FY / CY) and numeric year
-df_long["period_type"] = df_long["period"].str[:2]   # FY or CY
-df_long["period_year"] = df_long["period"].str[2:].astype(int)
-
-# optional: drop original period string
-df_long = df_long.drop(columns="period")
-
-df_long.head()
-
-# Sanity checks
-df_long.head()
-df_long["period_type"].value_counts()
-(df_long["period_year"].min(), df_long["period_year"].max())
-
-df_long = df_long[df_long["period_year"] > 2014]
-df_long = df_long.reset_index(drop=True)
-
-
-out = Path("/Users/eloaeza/projects/hadr-project/outputs/case_mix_data.csv")
-out.parent.mkdir(parents=True, exist_ok=True)
-df_long.to_csv(out, index=False)
-print("wrote:", out)
-
-########### Create a dataframe with selected comlumns
-# Step 2 — Decide what you want to keep (authoritative list)
 
-PARQUET = "/Users/eloaeza/projects/hadr-project/outputs/out_step1_single_sheet/fin_util_appended.parquet"
+DATA_DIR = Path("/Users/eloaeza/projects/hadr-project/data_raw/")
+OUT_DIR = Path("/Users/eloaeza/projects/hadr-project/outputs/")
 
 # Columns to select from the parquet file: P, C
 PAIRS = [
@@ -98,13 +87,6 @@ PAIRS = [
     ("12", "14"), # Gross Outpatient Revenue_Private - Traditional
     ("12", "15"), # Gross Inpatient Revenue_Private - Managed Care
     ("12", "16") # Gross Outpatient Revenue_Private - Managed Care
-    
-]
-
-# regex that matches any L for the selected P,C pairs
-pair_patterns = [
-    re.compile(rf"^P{p}_C{c}_L\d+$")
-    for p, c in PAIRS
 ]
 
 EXTRA_PCLS = {
@@ -114,352 +96,364 @@ EXTRA_PCLS = {
     "P0_C1_L37",
 }
 
-con = duckdb.connect()
-cols = con.execute(
-    f"DESCRIBE SELECT * FROM read_parquet('{PARQUET}')"
-).fetchdf()["column_name"]
-
-# select all matching PCLs
-needed_pcls = [
-    c for c in cols
-    if any(pat.match(c) for pat in pair_patterns) or c in EXTRA_PCLS
-]
-
-con.close()
-
-print("Number of columns selected:", len(needed_pcls))
-print("First 10:", needed_pcls[:10])
-print("Last 10:", needed_pcls[-10:])
-
-# Build the light dataframe
-
-select_list = ",\n  ".join([f'"{c}"' for c in needed_pcls])
-
-query = f"""
-SELECT
-  DISCLOSURE_CYCLE,
-  OSHPD_FACILITY_NUMBER,
-  REPORT_PERIOD_END_DATE,
-  {select_list}
-FROM read_parquet('{PARQUET}')
-"""
-
-df = duckdb.query(query).to_df()
-
-df["OSHPD_FACILITY_NUMBER"].nunique()
-
-df.dtypes
-
-# select columns that start with "P"
-p_cols = df.columns[df.columns.str.startswith("P")]
-
-# convert to numeric
-p_cols = [
-    c for c in df.columns
-    if c.startswith("P") and c not in {"P0_C1_L36", "P0_C1_L37"}
-]
-
-
-df.dtypes
-
-# ensure string
-df["OSHPD_FACILITY_NUMBER"] = df["OSHPD_FACILITY_NUMBER"].astype("string")
-
-# 2. Get TYPE_HOSP variables
-# split: first 3 chars = hospital_type, rest = oshpd_id (zero-padded if needed)
-df["hospital_type"] = df["OSHPD_FACILITY_NUMBER"].str[:3]
-df["oshpd_id"] = df["OSHPD_FACILITY_NUMBER"].str[3:].str.zfill(6)
-df[["oshpd_id", "hospital_type"]].dtypes
-df["hospital_type"].nunique()
-
-# 3. Filter to keep only Comparable hospitals
-df = df[~df["OSHPD_FACILITY_NUMBER"].isin(exclude_ids)]
-
-df["OSHPD_FACILITY_NUMBER"].nunique()
-
-# 4. Create year variable by using year of the reporting period end date
-#df["YEAR_BEGIN"] = pd.to_datetime(df["P0_C1_L36"], errors="coerce").dt.year
-df["YEAR_END"] = pd.to_datetime(df["P0_C1_L37"], errors="coerce").dt.year
-
-df[["YEAR_END"]].head()
-df[["YEAR_END"]].describe()
-
-
-df_long[["oshpd_id", "period_year"]].dtypes
-
-df[["OSHPD_FACILITY_NUMBER", "YEAR_END"]].dtypes
-
-
-# 5. Merge with the case mix dataset on year and hospital
-df = df.merge(
-    df_long[["oshpd_id", "period_year", "case_mix_index"]],
-    left_on=["oshpd_id", "YEAR_END"],
-    right_on=["oshpd_id", "period_year"],
-    how="left"
-)
-
-# 6. Round case mix index to 2 decimals
-df["case_mix_index"] = df["case_mix_index"].round(2)
-
-
-# 7. Remove duplicates
-# 7.a. Calculate period length as the difference in days between reporting end date and reporting begin date
-df["DAY_PER"] = (
-    pd.to_datetime(df["P0_C1_L37"], errors="coerce")
-    - pd.to_datetime(df["P0_C1_L36"], errors="coerce")
-).dt.days
-
-df["BEGIN_DATE"] = pd.to_datetime(df["P0_C1_L36"], errors="coerce")
-df["END_DATE"] = pd.to_datetime(df["P0_C1_L37"], errors="coerce")
-
-
-# drop by column names
-df = df.drop(columns=["P0_C1_L37", "P0_C1_L36", "P0_C1_L2", "period_year"])
-df["END_DATE"].dtypes
-
-# Keep relevant years for the analysis
-df = df[(df["YEAR_END"] >= 2018) & (df["YEAR_END"] <= 2022)]
-df["YEAR_END"].describe()
-
-# 7.b Sort by hospital name, year, period length (descending), and end date (descending)
-
-df = (
-    df.sort_values(
-        by=["P0_C1_L3", "YEAR_END", "DAY_PER", "END_DATE"],
-        ascending=[True, True, False, False]
+STAGES = ["exclusions", "case_mix", "selection", "dedupe", "ccr", "totals", "summary", "reconcile"]
+
+CCR_ENGINES = ["pandas", "polars"]
+BACKENDS = ["pandas", "polars"]
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    data_dir: Path = DATA_DIR
+    out_dir: Path = OUT_DIR
+    years: tuple[int, int] = (2018, 2022)
+    pairs: tuple[tuple[str, str], ...] = tuple(PAIRS)
+    extra_pcls: frozenset[str] = field(default_factory=lambda: frozenset(EXTRA_PCLS))
+    max_revenue_center: int | None = 416
+    ccr_engine: str = "pandas"
+    backend: str = "pandas"
+    # replicated -> published column names and tolerances (reconcile.py)
+    published_columns: tuple[tuple[str, str], ...] = tuple(PUBLISHED_COLUMNS.items())
+    reconcile_atol: float = ATOL
+    reconcile_rtol: float = RTOL
+    # read the selection from the ingest catalog when it is current (catalog.py)
+    use_catalog: bool = True
+
+    @property
+    def documentation_pdf(self) -> Path:
+        return self.data_dir / "hadrfull-db-documentation-rpe2015-xx.pdf"
+
+    @property
+    def case_mix_xlsx(self) -> Path:
+        return self.data_dir / "case-mix-index-d6t7du37" / "case-mix-index-1996-2024.xlsx"
+
+    @property
+    def case_mix_parquet(self) -> Path:
+        return self.out_dir / "case_mix_data.parquet"
+
+    @property
+    def published_csv(self) -> Path:
+        return self.data_dir / "Hospital-Cost-Data-Updated-June-2025-1.csv"
+
+    @property
+    def appended(self) -> Path:
+        # hive-partitioned by DISCLOSURE_CYCLE (see step1 append_partitioned)
+        return self.out_dir / "out_step1_single_sheet" / "fin_util_appended"
+
+    @property
+    def catalog(self) -> Path:
+        return catalog_path(self.appended.parent)
+
+    @property
+    def cube_dir(self) -> Path:
+        return self.out_dir / "cost_cube"
+
+    @property
+    def exclusion_cache_dir(self) -> Path:
+        return self.out_dir / "non_comparable"
+
+    @property
+    def stage_dir(self) -> Path:
+        return self.out_dir / "benchmark_stages"
+
+    @property
+    def cache_dir(self) -> Path:
+        return self.out_dir / "stage_cache"
+
+
+# Create a table with selected columns for the comparable hospitals in the year window
+def select_measures(
+    appended: Path,
+    pairs: list[tuple[str, str]],
+    extra_pcls: set[str],
+    exclude_ids: pd.DataFrame,
+    years: tuple[int, int],
+    catalog: Path | None = None,
+) -> pa.Table:
+    """
+    Filtering and facility-number parsing run inside the scan, so only the
+    rows used by the benchmark are materialized (as Arrow). Adds
+    hospital_type, oshpd_id, BEGIN_DATE, END_DATE and YEAR_END.
+
+    With a current catalog (catalog.py) the rows come from its materialized
+    measures table instead of the parquet. Either way rows come back in
+    ROW_ORDER (cycle, file, row in file), so dedupe ties break the same way.
+    """
+    con = open_catalog(catalog, "fin_util", appended, pairs, extra_pcls) if catalog else None
+    if con is not None:
+        # select all matching PCLs (column list kept in the catalog)
+        needed_pcls = measure_columns(catalog_columns(con, "fin_util"), pairs, extra_pcls)
+        source = "fin_util_measures"
+        order = "ORDER BY row_id"
+    else:
+        con = duckdb.connect()
+        scan = parquet_scan(appended)
+        cols = con.execute(f"DESCRIBE SELECT * FROM {scan}").fetchdf()["column_name"]
+        # select all matching PCLs
+        needed_pcls = measure_columns(cols, pairs, extra_pcls)
+        source = f"({selection_sql(parquet_scan(appended, row_order=True), needed_pcls, row_order=True)})"
+        order = f"ORDER BY {', '.join(ROW_ORDER)}"
+
+    excluded = pa.table({
+        "OSHPD_FACILITY_NUMBER": pa.array(exclude_ids["OSHPD_FACILITY_NUMBER"].astype(str), pa.string())
+    })
+    con.register("excluded", excluded)
+
+    columns = ", ".join(f'"{c}"' for c in LEADING + needed_pcls + DERIVED)
+    query = f"""
+    SELECT {columns}
+    FROM {source} src
+    -- 3. keep only Comparable hospitals
+    WHERE NOT EXISTS (
+      SELECT 1 FROM excluded e WHERE e.OSHPD_FACILITY_NUMBER = src.OSHPD_FACILITY_NUMBER
     )
-    # 7.c Keep first record per hospital per year with the longest period or most recent
-    .drop_duplicates(subset=["P0_C1_L3", "YEAR_END"], keep="first")
-)
-
-# Drop some columns 
-df = df.drop(columns=["DISCLOSURE_CYCLE","REPORT_PERIOD_END_DATE", "hospital_type", "DAY_PER", "BEGIN_DATE", "END_DATE"])
-
-
-# Reshape the data so it is easy to perform the calculations:
-id_vars = [
-    "OSHPD_FACILITY_NUMBER",
-    "P0_C1_L3",      # hospital id (example)
-    "oshpd_id",
-    "YEAR_END",
-    "case_mix_index",
-]
-
-
-# 2) Select only the PCL columns you want to reshape
-value_vars = [c for c in df.columns if c.startswith("P")]
-
-# 3) Melt to long
-long = df.melt(
-    id_vars=id_vars,
-    value_vars=value_vars,
-    var_name="pcl",
-    value_name="value"
-)
-
-# 4) Extract Px_Cx and revenue_center (L)
-long["px_cx"] = long["pcl"].str.extract(r"^(P\d+_C\d+)")
-long["revenue_center"] = (
-    long["pcl"]
-    .str.extract(r"_L(\d+)")
-    .astype("Int64")
-)
-
-# make sure long["value"] is numeric
-long["value"] = pd.to_numeric(long["value"], errors="coerce")
-
-# Step 1: pivot back just for the calculation
-calc = (
-    long
-    .pivot_table(
-        index=["OSHPD_FACILITY_NUMBER", "P0_C1_L3", "YEAR_END", "revenue_center"],
-        columns="px_cx",
-        values="value",
-        aggfunc="first"
+    -- keep relevant years for the analysis
+    AND YEAR_END BETWEEN {int(years[0])} AND {int(years[1])}
+    {order}
+    """
+    with duckdb_profile(con, "selection"):
+        table = con.execute(query).fetch_arrow_table()
+    con.close()
+    return table
+
+
+def prepare(df: pd.DataFrame, case_mix: pd.DataFrame) -> pd.DataFrame:
+    # ensure string
+    df = df.assign(
+        OSHPD_FACILITY_NUMBER=df["OSHPD_FACILITY_NUMBER"].astype("string"),
+        hospital_type=df["hospital_type"].astype("string"),
+        oshpd_id=df["oshpd_id"].astype("string"),
     )
-    .reset_index()
-)
 
-long.dtypes
-calc.dtypes
+    # 5. Look up the case mix index by year and hospital
+    cmi = CaseMixIndex(case_mix).lookup(df["oshpd_id"], df["YEAR_END"])
 
-# Step 2: compute Cost-to-Charge Ratio
-calc["cost_to_charge_ratio"] = (
-    (calc["P10_C9"].fillna(0) + calc["P10_C13"].fillna(0))
-    .div(calc["P10_C11"])
-)
-calc.loc[calc["P10_C11"].isna() | (calc["P10_C11"] == 0), "cost_to_charge_ratio"] = pd.NA
-
-calc["revenue_center"].nunique()
-
-# Not revenue centers
-calc = calc[(calc["revenue_center"] <416)]
+    # 6. Round case mix index to 2 decimals
+    return df.assign(case_mix_index=cmi.round(2))
 
 
-# Delete no revenue centers (with all nan)
-calc = calc.groupby("revenue_center", group_keys=False).filter(
-    lambda g: g["cost_to_charge_ratio"].notna().any()
-)
-
-#  7.iii. For each revenue center and payer, calculate cost using cost-to-
-#charge ratio from previous step multiplied by the sum of revenue
-#center revenue from inpatient, outpatient, traditional care and
-#managed care payer revenue
+def dedupe(df: pd.DataFrame) -> pd.DataFrame:
+    # 7. Remove duplicates
+    # 7.a. Period length is the difference in days between reporting end date and reporting begin date
+    begin = df["BEGIN_DATE"] if "BEGIN_DATE" in df else pd.to_datetime(df["P0_C1_L36"], errors="coerce")
+    end = df["END_DATE"] if "END_DATE" in df else pd.to_datetime(df["P0_C1_L37"], errors="coerce")
 
-calc["medicare_cost_rc"] = (
-    (calc["P12_C1"].fillna(0) + calc["P12_C2"].fillna(0)
-     + calc["P12_C3"].fillna(0) + calc["P12_C4"].fillna(0))
-    * (calc["cost_to_charge_ratio"])
-)
+    # 7.b/c Keep one record per hospital per year: the longest period, then the most recent (best_report.py)
+    df = best_reports(df, ["P0_C1_L3", "YEAR_END"], begin=begin, end=end)
 
-calc["private_cost_rc"] = (
-    (calc["P12_C13"].fillna(0) + calc["P12_C14"].fillna(0)
-     + calc["P12_C15"].fillna(0) + calc["P12_C16"].fillna(0))
-    * (calc["cost_to_charge_ratio"])
-)
+    # Drop some columns
+    return df.drop(
+        columns=["P0_C1_L37", "P0_C1_L36", "P0_C1_L2", "BEGIN_DATE", "END_DATE",
+                 "DISCLOSURE_CYCLE", "REPORT_PERIOD_END_DATE", "hospital_type"],
+        errors="ignore",
+    )
 
 
-# 7.b Calculate total costs for Medicare and Commercial payers by summing
-#total costs across revenue centers by payer 
-df_tot = (
-    calc.groupby(["OSHPD_FACILITY_NUMBER", "P0_C1_L3", "YEAR_END"], as_index=False)
-        .agg(
-            tot_medicare=("medicare_cost_rc", lambda s: s.sum(min_count=1)),
-            tot_private=("private_cost_rc", lambda s: s.sum(min_count=1)),
+def ccr(df: pd.DataFrame, max_revenue_center: int | None = 416, engine: str = "pandas") -> pd.DataFrame:
+    # 8.a Cost-to-charge ratio and payer costs per revenue center
+    # (benchmark_engine.py, or the lazy Polars plan in benchmark_polars.py)
+    if engine == "polars":
+        from benchmark_polars import compute_calc_polars
+        calc = to_pandas(compute_calc_polars(df))
+    else:
+        calc = compute_calc(df)
+    # Not revenue centers (lines >= 416), and delete revenue centers with no CCR at all
+    return drop_empty_revenue_centers(calc, max_revenue_center)
+
+
+def run_pipeline(
+    config: PipelineConfig = PipelineConfig(),
+    start_at: str | None = None,
+    cache: StageCache | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Run every stage and return the outputs by name; each output is also
+    written to config.stage_dir.
+
+    With a cache, a stage whose inputs, parameters, upstream stages and
+    code are unchanged is loaded instead of recomputed. Stages from
+    `start_at` on are always recomputed. Without a cache, stages before
+    `start_at` are read back from config.stage_dir.
+    """
+    # a wrong published column would otherwise only fail after every other stage
+    if config.published_csv.exists():
+        missing = missing_columns(config.published_csv, dict(config.published_columns))
+        if missing:
+            raise KeyError(f"{config.published_csv.name} has no column(s) {missing}; see published_columns")
+
+    config.stage_dir.mkdir(parents=True, exist_ok=True)
+    first = STAGES.index(start_at) if start_at else (len(STAGES) if cache else 0)
+    out: dict[str, pd.DataFrame] = {}
+    keys: dict[str, str] = {}
+
+    def stage(name, parts, fn, *args):
+        with span(name) as s:
+            df, status = run_stage(name, parts, fn, *args)
+            s.rows_in(*[a for a in args if isinstance(a, (pd.DataFrame, pa.Table))])
+            s.rows_out(df).set(status=status, key=keys[name])
+        print(f"{name}: {status} {df.shape} -> {config.stage_dir / f'{name}.parquet'}")
+        out[name] = df
+        return df
+
+    def run_stage(name, parts, fn, *args):
+        path = config.stage_dir / f"{name}.parquet"
+        forced = STAGES.index(name) >= first
+        keys[name] = stage_key(name, parts)
+
+        df = None
+        if not forced:
+            df = cache.get(name, keys[name]) if cache else pd.read_parquet(path)
+        status = "cached" if df is not None else "computed"
+
+        if cache and df is not None:
+            shutil.copyfile(cache.path(name, keys[name]), path)
+        elif df is None:
+            # stages may return Arrow tables; those are written as is and
+            # converted to pandas once
+            result = fn(*args)
+            if cache:
+                cache.put(name, keys[name], result, parts)
+                shutil.copyfile(cache.path(name, keys[name]), path)
+            else:
+                write_parquet(result, path)
+            df = to_pandas(result) if isinstance(result, pa.Table) else result
+        return df, status
+
+    # 1. Get ids for HOSPITALS THAT SUBMIT NON-COMPARABLE REPORTS (exclusions.py)
+    exclude_ids = stage(
+        "exclusions",
+        {"pdf": file_fingerprint(config.documentation_pdf), "code": code_fingerprint(exclusions)},
+        non_comparable_ids, config.documentation_pdf, config.exclusion_cache_dir,
+    )
+    case_mix = stage(
+        "case_mix",
+        {"xlsx": file_fingerprint(config.case_mix_xlsx), "code": code_fingerprint(case_mix_module)},
+        case_mix_store, config.case_mix_xlsx, config.case_mix_parquet,
+    )
+    if config.backend == "polars":
+        polars_stages(config, stage, keys, exclude_ids, case_mix)
+    else:
+        pandas_stages(config, stage, keys, exclude_ids, case_mix)
+
+    # Facility x year x revenue-center cube of the ccr output, for analysis (cost_cube.py)
+    if cube_source(config.cube_dir) != keys["ccr"]:
+        with span("cube") as s:
+            write_cost_cube(out["ccr"], config.cube_dir, source=keys["ccr"])
+            s.rows_in(out["ccr"])
+
+    # Compare with OHCA's published Hospital Cost Data, when it is there
+    if config.published_csv.exists():
+        columns = dict(config.published_columns)
+        stage(
+            "reconcile",
+            {
+                "upstream": keys["totals"],
+                "published": file_fingerprint(config.published_csv),
+                "columns": config.published_columns,
+                "tolerance": [config.reconcile_atol, config.reconcile_rtol],
+                "code": code_fingerprint(reconcile_module),
+            },
+            lambda: reconcile(
+                out["totals"], load_published(config.published_csv, columns), measures_of(columns),
+                atol=config.reconcile_atol, rtol=config.reconcile_rtol,
+            ),
         )
-)
-
-
-
-
-summary = (
-    calc
-    .groupby("revenue_center", as_index=False)["cost_to_charge_ratio"]
-    .agg(
-        mean="mean",
-        median="median",
-        min = "min",
-        max = "max",
-        p25=lambda x: x.quantile(0.25),
-        p75=lambda x: x.quantile(0.75),
-        n="count"
+    return out
+
+
+def pandas_stages(config, stage, keys, exclude_ids, case_mix) -> None:
+    this = sys.modules[__name__]
+    selected = stage(
+        "selection",
+        {
+            "appended": file_fingerprint(config.appended),
+            "upstream": keys["exclusions"],
+            "pairs": config.pairs,
+            "extra_pcls": config.extra_pcls,
+            "years": config.years,
+            # scan and catalog give the same rows; a rebuilt catalog still
+            # invalidates the entry
+            "catalog": file_fingerprint(config.catalog) if config.use_catalog else None,
+            "code": code_fingerprint(this, catalog_module),
+        },
+        select_measures,
+        config.appended, list(config.pairs), set(config.extra_pcls), exclude_ids, config.years,
+        config.catalog if config.use_catalog else None,
     )
-)
-
-check = calc[(calc["revenue_center"] ==250)]
-
-
-
-# read the file
-df_final = pd.read_csv(
-    "/Users/eloaeza/projects/hadr-project/data_raw/Hospital-Cost-Data-Updated-June-2025-1.csv"
-)
-
-df_final["cy"].describe()
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-#select_list = ",\n  ".join([
- #   f'"{c}" AS "{fin_p2l.get(c, c)}"'
- #   for c in needed_pcls
-#])
-
-# Step 1
-
-PAIRS = [
-    ("10", "9"),
-    ("10", "11"),
-    ("10", "13"),
-    ("12", "1"),
-    ("12", "2"),
-    ("12", "3"),
-    ("12", "4"),
-]
-
-# These stay WIDE (identifiers)
-EXTRA_PCLS = ["P0_C1_L36", "P0_C1_L37"]
-
-pair_patterns = [re.compile(rf"^P{p}_C{c}_L\d+$") for p, c in PAIRS]
-
-
-# Step 2 — discover columns and split them
-con = duckdb.connect()
-cols = con.execute(
-    f"DESCRIBE SELECT * FROM read_parquet('{PARQUET}')"
-).fetchdf()["column_name"].tolist()
-
-# columns to unpivot (measures)
-MEASURE_PCLS = [
-    c for c in cols
-    if any(pat.match(c) for pat in pair_patterns)
-]
-
-# sanity: make sure extras exist
-missing = [c for c in EXTRA_PCLS if c not in cols]
-if missing:
-    raise ValueError(f"Missing identifier columns: {missing}")
-
-# Step 3 — UNPIVOT only the measure columns
-
-wide_measures = ",\n  ".join([f'"{c}"' for c in MEASURE_PCLS])
-in_list = ", ".join([f'"{c}"' for c in MEASURE_PCLS])
-
-wide_ids = ",\n  ".join(
-    ["DISCLOSURE_CYCLE", "OSHPD_FACILITY_NUMBER", "REPORT_PERIOD_END_DATE"]
-    + [f'"{c}"' for c in EXTRA_PCLS]
-)
-
-query = f"""
-WITH base AS (
-  SELECT
-    {wide_ids},
-    {wide_measures}
-  FROM read_parquet('{PARQUET}')
-)
-SELECT
-  {wide_ids},
-  pcl,
-  value
-FROM base
-UNPIVOT (value FOR pcl IN ({in_list}))
-"""
-
-# Step 4 — execute and parse P/C/L
+    deduped = stage(
+        "dedupe",
+        {
+            "upstream": [keys["case_mix"], keys["selection"]],
+            # prepare / dedupe call into CaseMixIndex and best_reports
+            "code": code_fingerprint(this, case_mix_module, best_report),
+        },
+        lambda: dedupe(prepare(selected, case_mix)),
+    )
+    engines = [benchmark_engine]
+    if config.ccr_engine == "polars":
+        import benchmark_polars
+        engines.append(benchmark_polars)
+    engine = code_fingerprint(this, *engines)
+    calc = stage(
+        "ccr",
+        {
+            "upstream": keys["dedupe"],
+            "max_revenue_center": config.max_revenue_center,
+            # the code of the engine that runs; both give the same result,
+            # so the engine name itself is not part of the key
+            "code": engine,
+        },
+        ccr, deduped, config.max_revenue_center, config.ccr_engine,
+    )
+    # 7.b Calculate total costs for Medicare and Commercial payers by summing
+    # total costs across revenue centers by payer
+    stage("totals", {"upstream": keys["ccr"], "code": engine}, facility_totals, calc)
+    stage("summary", {"upstream": keys["ccr"], "code": engine}, ccr_summary, calc)
+
+
+def polars_stages(config, stage, keys, exclude_ids, case_mix) -> None:
+    from pipeline_polars import run_polars
+    import benchmark_polars
+    import pipeline_polars
+
+    # the plan is only run if one of its stages is not cached
+    fused: dict = {}
+
+    def output(name):
+        if not fused:
+            fused.update(run_polars(
+                config.appended, list(config.pairs), set(config.extra_pcls),
+                exclude_ids, case_mix, config.years, config.max_revenue_center,
+            ))
+        return fused[name]
+
+    code = code_fingerprint(sys.modules[__name__], benchmark_engine, benchmark_polars, pipeline_polars)
+    stage(
+        "dedupe",
+        {
+            "backend": "polars",
+            "appended": file_fingerprint(config.appended),
+            "upstream": [keys["exclusions"], keys["case_mix"]],
+            "pairs": config.pairs,
+            "extra_pcls": config.extra_pcls,
+            "years": config.years,
+            "code": code,
+        },
+        output, "dedupe",
+    )
+    stage(
+        "ccr",
+        {"upstream": keys["dedupe"], "max_revenue_center": config.max_revenue_center, "code": code},
+        output, "ccr",
+    )
+    stage("totals", {"upstream": keys["ccr"], "code": code}, output, "totals")
+    stage("summary", {"upstream": keys["ccr"], "code": code}, output, "summary")
 
-df_long = con.execute(query).fetchdf()
-con.close()
 
-m = df_long["pcl"].str.extract(
-    r"^P(?P<page>\d+(?:\.\d+)?)_C(?P<col>\d+(?:\.\d+)?)_L(?P<line>\d+)$"
-)
-df_long = pd.concat([df_long, m], axis=1)
+def main():
+    config = PipelineConfig()
+    run_pipeline(config, cache=StageCache(config.cache_dir))
 
-df_long["line"] = df_long["line"].astype("Int64")
-df_long["pair"] = "P" + df_long["page"] + "_C" + df_long["col"]
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Feb  7 10:18:46 2026
+
+@author: eloaeza
+
+Row readers for the HADR workbooks, behind one interface:
+
+    with open_sheet(path, "Financial and Utilization Data") as (reader, rows):
+        header4 = [next(rows, ()) for _ in range(4)]
+        for row in rows:
+            ...
+
+Backends, in the order "auto" tries them:
+
+    calamine   python-calamine (Rust), if installed; loads the sheet at once
+    xml        streaming parse of the sheet XML in the .xlsx zip (stdlib
+               zipfile + ElementTree), one row in memory at a time
+    openpyxl   openpyxl read-only mode
+
+Every backend yields the same rows: one tuple of cell values per sheet row
+from row 1, with openpyxl's cell types (int / float / str / bool /
+datetime / time), trailing empty cells dropped, missing rows as (), and no
+trailing blank rows. Empty strings and Excel error values (#N/A, #DIV/0!,
+...) are None; calamine does not report either, and the ingest nulls them
+anyway (ingest_types.normalize_cell). Text has its _xHHHH_ escapes decoded
+(_x000D_ -> carriage return, _x005F_ -> "_"), as calamine does; openpyxl
+only strips "x005F_" from shared strings, so its backend is given the raw
+table and decodes like the xml one. The one case left is a cached formula
+result (t="str"), which calamine keeps as written and openpyxl, unable to
+tell it from an inline string, decodes.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import importlib.util
+import posixpath
+import re
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+from xml.etree.ElementTree import fromstring, iterparse
+
+import openpyxl
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+
+READERS = ["calamine", "xml", "openpyxl"]
+
+EXCEL_ERRORS = {
+    "#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A", "#GETTING_DATA",
+}
+
+# calamine returns every number as float; openpyxl gives ints for integral
+# cell text, which floats represent exactly up to 2**53
+MAX_EXACT = 2**53
+
+ESCAPE = re.compile(r"_x([0-9A-Fa-f]{4})_")
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+class UnsupportedWorkbook(ValueError):
+    """The backend cannot read this workbook; "auto" moves on to the next one."""
+
+
+def available_readers() -> list[str]:
+    return [r for r in READERS if r != "calamine" or importlib.util.find_spec("python_calamine")]
+
+
+def unescape(text: str) -> str:
+    """Decode the OOXML _xHHHH_ escapes in cell text."""
+    if "_x" not in text:
+        return text
+    return ESCAPE.sub(_unescape_match, text)
+
+
+def _unescape_match(m: re.Match) -> str:
+    # surrogates are no character on their own; calamine keeps those as written
+    code = int(m.group(1), 16)
+    return m.group(0) if 0xD800 <= code <= 0xDFFF else chr(code)
+
+
+def _tidy(rows: Iterator) -> Iterator[tuple]:
+    # drop trailing empty cells; hold blank rows back so trailing ones are dropped
+    n_blank = 0
+    for row in rows:
+        n = len(row)
+        while n and row[n - 1] is None:
+            n -= 1
+        if not n:
+            n_blank += 1
+            continue
+        for _ in range(n_blank):
+            yield ()
+        n_blank = 0
+        yield tuple(row[:n])
+
+
+# ---- calamine ---------------------------------------------------------------
+
+def _calamine_value(v):
+    if v.__class__ is float:
+        if v.is_integer() and -MAX_EXACT < v < MAX_EXACT:
+            return int(v)
+        return v
+    if v.__class__ is str:
+        return None if not v or v in EXCEL_ERRORS else v
+    if v.__class__ is dt.date:
+        return dt.datetime(v.year, v.month, v.day)
+    return v
+
+
+def _open_calamine(path: Path, sheet: str) -> tuple[Iterator, Callable]:
+    from python_calamine import CalamineWorkbook
+
+    try:
+        wb = CalamineWorkbook.from_path(str(path))
+    except Exception as e:
+        raise UnsupportedWorkbook(str(e)) from e
+    if sheet not in wb.sheet_names:
+        wb.close()
+        raise KeyError(f"Worksheet {sheet} does not exist.")
+    ws = wb.get_sheet_by_name(sheet)
+
+    def rows():
+        # iter_rows() converts a row at a time but follows the used range,
+        # which need not start at A1; to_python() pads from A1 in one go
+        if (ws.start or (0, 0)) == (0, 0):
+            source = ws.iter_rows()
+        else:
+            source = ws.to_python(skip_empty_area=False)
+        for row in source:
+            yield tuple(map(_calamine_value, row))
+
+    return rows(), wb.close
+
+
+# ---- xml --------------------------------------------------------------------
+
+def _tag(name: str, ns: str = MAIN_NS) -> str:
+    return f"{{{ns}}}{name}"
+
+
+def _text(node) -> str:
+    # openpyxl's Text.content: the plain <t> and the rich text runs, not phonetic runs
+    parts = []
+    for child in node:
+        if child.tag == _tag("t"):
+            parts.append(child.text or "")
+        elif child.tag == _tag("r"):
+            parts.append(child.findtext(_tag("t")) or "")
+    return "".join(parts)
+
+
+def _part(base: str, target: str) -> str:
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target))
+
+
+def _workbook_targets(zf: zipfile.ZipFile) -> tuple:
+    """workbook.xml root and its relationships, id -> (type, part)."""
+    try:
+        workbook = fromstring(zf.read("xl/workbook.xml"))
+        rels = fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    except KeyError as e:
+        raise UnsupportedWorkbook(f"no {e.args[0]}") from None
+    if workbook.tag != _tag("workbook"):
+        raise UnsupportedWorkbook(f"unexpected workbook namespace {workbook.tag}")
+
+    targets = {
+        r.get("Id"): (r.get("Type", "").rsplit("/", 1)[-1], _part("xl/workbook.xml", r.get("Target", "")))
+        for r in rels.iter(_tag("Relationship", PKG_REL_NS))
+    }
+    return workbook, targets
+
+
+def _shared_strings(zf: zipfile.ZipFile, targets: dict) -> list[str]:
+    # raw text, escapes not decoded
+    strings = []
+    for kind, part in targets.values():
+        if kind == "sharedStrings":
+            with zf.open(part) as src:
+                for _, node in iterparse(src):
+                    if node.tag == _tag("si"):
+                        strings.append(_text(node))
+                        node.clear()
+    return strings
+
+
+def _workbook_parts(zf: zipfile.ZipFile, sheet: str) -> dict:
+    """Sheet part, shared strings, date styles and epoch of the workbook."""
+    workbook, targets = _workbook_targets(zf)
+    sheets = {s.get("name"): s.get(_tag("id", REL_NS)) for s in workbook.iter(_tag("sheet"))}
+    if sheet not in sheets:
+        raise KeyError(f"Worksheet {sheet} does not exist.")
+
+    pr = workbook.find(_tag("workbookPr"))
+    date1904 = pr is not None and pr.get("date1904", "0").lower() in ("1", "true")
+
+    strings = [unescape(t) for t in _shared_strings(zf, targets)]
+
+    # style index -> date / timedelta, as openpyxl's Stylesheet indexes them
+    dates, timedeltas = set(), set()
+    for kind, part in targets.values():
+        if kind == "styles":
+            styles = fromstring(zf.read(part))
+            custom = {
+                int(f.get("numFmtId")): f.get("formatCode")
+                for f in styles.iter(_tag("numFmt"))
+            }
+            xfs = styles.find(_tag("cellXfs"))
+            for idx, xf in enumerate(xfs if xfs is not None else []):
+                num_fmt = int(xf.get("numFmtId", 0))
+                fmt = custom.get(num_fmt, BUILTIN_FORMATS.get(num_fmt))
+                if is_date_format(fmt):
+                    dates.add(idx)
+                if is_timedelta_format(fmt):
+                    timedeltas.add(idx)
+
+    return {
+        "sheet": targets[sheets[sheet]][1],
+        "strings": strings,
+        "dates": dates,
+        "timedeltas": timedeltas,
+        "epoch": CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900,
+    }
+
+
+def _xml_rows(src, strings: list[str], dates: set, timedeltas: set, epoch) -> Iterator[list]:
+    ROW, V, IS = _tag("row"), _tag("v"), _tag("is")
+    columns: dict[str, int] = {}
+    n_row = 0
+    for _, el in iterparse(src):
+        if el.tag != ROW:
+            continue
+        r = el.get("r")
+        idx = int(r) if r else n_row + 1
+        for _ in range(n_row + 1, idx):
+            yield ()
+        n_row = idx
+
+        values = []
+        col = 0
+        for c in el:
+            ref = c.get("r")
+            if ref:
+                letters = ref.rstrip("0123456789")
+                col = columns.get(letters)
+                if col is None:
+                    col = columns[letters] = column_index_from_string(letters)
+            else:
+                col += 1
+            t = c.get("t", "n")
+            if t == "inlineStr":
+                node = c.find(IS)
+                value = unescape(_text(node)) if node is not None else None
+            else:
+                value = c.findtext(V) or None
+                if value is not None:
+                    if t == "n":
+                        value = float(value) if "." in value or "E" in value or "e" in value else int(value)
+                        style = int(c.get("s", 0))
+                        if style in dates:
+                            try:
+                                value = from_excel(value, epoch, timedelta=style in timedeltas)
+                            except (OverflowError, ValueError):
+                                value = None
+                    elif t == "s":
+                        value = strings[int(value)]
+                    elif t == "b":
+                        value = bool(int(value))
+                    elif t == "e":
+                        value = None
+                    elif t == "d":
+                        value = from_ISO8601(value)
+            if value is None or (value.__class__ is str and (not value or value in EXCEL_ERRORS)):
+                continue
+            if col > len(values):
+                values.extend([None] * (col - len(values)))
+            values[col - 1] = value
+        el.clear()
+        yield values
+
+
+def _open_xml(path: Path, sheet: str) -> tuple[Iterator, Callable]:
+    try:
+        zf = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise UnsupportedWorkbook(str(e)) from e
+    try:
+        parts = _workbook_parts(zf, sheet)
+        src = zf.open(parts.pop("sheet"))
+    except BaseException:
+        zf.close()
+        raise
+
+    def close():
+        src.close()
+        zf.close()
+
+    return _xml_rows(src, **parts), close
+
+
+# ---- openpyxl ---------------------------------------------------------------
+
+def _open_openpyxl(path: Path, sheet: str) -> tuple[Iterator, Callable]:
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet]
+        with zipfile.ZipFile(path) as zf:
+            # openpyxl's own table has "x005F_" stripped, which cannot be undone
+            ws._shared_strings = _shared_strings(zf, _workbook_targets(zf)[1])
+    except BaseException:
+        wb.close()
+        raise
+    ws.reset_dimensions()
+
+    def value(v):
+        if v.__class__ is str:
+            v = unescape(v)
+            return None if not v or v in EXCEL_ERRORS else v
+        return v
+
+    rows = (tuple(map(value, row)) for row in ws.iter_rows(values_only=True))
+    return rows, wb.close
+
+
+def resolve_reader(reader: str = "auto") -> str:
+    """The backend open_sheet() starts with for `reader`."""
+    if reader == "auto":
+        return available_readers()[0]
+    if reader not in OPENERS:
+        raise ValueError(f"unknown xlsx reader {reader!r}; expected auto or one of {READERS}")
+    if reader not in available_readers():
+        raise ImportError(f"the {reader} xlsx reader needs python-calamine (pip install python-calamine)")
+    return reader
+
+
+OPENERS = {
+    "calamine": _open_calamine,
+    "xml": _open_xml,
+    "openpyxl": _open_openpyxl,
+}
+
+
+@contextmanager
+def open_sheet(path: Path, sheet: str, reader: str = "auto"):
+    """
+    (backend used, row iterator) for one sheet. With reader="auto" the first
+    available backend that can open the workbook is used; a missing sheet
+    raises KeyError whatever the backend.
+    """
+    path = Path(path)
+    candidates = available_readers() if reader == "auto" else [resolve_reader(reader)]
+    for name in candidates:
+        try:
+            rows, close = OPENERS[name](path, sheet)
+            break
+        except UnsupportedWorkbook as e:
+            if name == candidates[-1]:
+                raise
+            print(f"{name} reader cannot read {path.name} ({e}); falling back")
+    try:
+        yield name, _tidy(rows)
+    finally:
+        close()